@@ -1,192 +1,271 @@
-import eel
+import base64
 import logging
 import json
 import os
 import multiprocessing
 import queue
 import threading
-from scrcpy_wrapper3v import ScrcpyClient
+import time
+from worker import METRICS_PORT, scrcpy_worker_process
 
 SETTINGS_FILE = 'settings.json'
-eel.init('GUI')
-
-def scrcpy_worker_process(command_queue, log_queue):
-    client = None
-    logger = logging.getLogger("Worker")
-    logger.setLevel(logging.INFO)
-    
-    while True:
-        try:
-            try:
-                msg = command_queue.get(timeout=0.1)
-                
-                if msg['action'] == 'START':
-                    s = msg['data']
-                    env_path = s.get('env_path', '')
-                    env_path = env_path if env_path.strip() != "" else None
-                    
-                    try:
-                        client = ScrcpyClient(ENV=env_path, debug=True)
-                        log_queue.put(f"Worker: Initializing Scrcpy...")
-
-                        # 1. Connection
-                        tcp_ip = s.get('tcp_ip', None)
-                        serial = s.get('serial', None)
-                        
-                        if tcp_ip and tcp_ip.strip():
-                             client.connect_device(device_ip_port=tcp_ip)
-                             client.set_connection(tcp=True)
-                        elif serial and serial != "No devices found":
-                             client.set_connection(serial=serial)
-                        else:
-                             client.set_connection(usb=True)
-
-                        # 2. Video
-                        client.set_video(
-                            max_size=int(s.get('max_size', 0)),
-                            fps=int(s.get('fps', 0)),
-                            bitrate=s.get('bitrate', None),
-                            codec=s.get('video_codec', 'h265'),
-                            buffer=int(s.get('video_buffer', 0)),
-                            codec_options=s.get('codec_options', None),
-                            no_video=s.get('no_video', False)
-                        )
-
-                        # 3. Audio
-                        audio_src = s.get('audio_source', 'playback')
-                        dup = s.get('audio_dup', False)
-                        if audio_src == 'mic': dup = False 
-
-                        client.set_audio(
-                            source=audio_src, codec=s.get('audio_codec', 'aac'),
-                            bitrate=s.get('audio_bitrate', None), audio_dup=dup,
-                            no_audio=s.get('no_audio', False)
-                        )
-
-                        # 4. App
-                        wx = int(s['window_x']) if s.get('window_x') else None
-                        wy = int(s['window_y']) if s.get('window_y') else None
-                        ww = int(s['window_width']) if s.get('window_width') else None
-                        wh = int(s['window_height']) if s.get('window_height') else None
-
-                        client.set_application(
-                            title=s.get('window_title', "GUIPy Scrcpy"),
-                            fullscreen=s.get('fullscreen', False),
-                            always_top=s.get('always_top', False),
-                            borderless=s.get('borderless', False),
-                            window_x=wx, window_y=wy, width=ww, height=wh
-                        )
-
-                        # 5. Control & Controller
-                        client.set_control(
-                            no_control=s.get('no_control', False),
-                            stay_awake=s.get('stay_awake', False),
-                            turn_screen_off=s.get('turn_screen_off', False),
-                            power_off_on_close=s.get('power_off_on_close', False)
-                        )
-                        client.set_controller(
-                            keyboard=s.get('keyboard_mode', 'sdk'),
-                            mouse=s.get('mouse_mode', 'sdk'),
-                            gamepad=s.get('gamepad_mode', 'disabled')
-                        )
-
-                        # 6. Camera & Advanced
-                        if s.get('use_camera', False):
-                            cid = int(s['camera_id']) if s.get('camera_id') else None
-                            client.set_camera(video_source="camera", camera_facing=s.get('camera_facing', None),
-                                              camera_size=s.get('camera_size', None), camera_id=cid)
-
-                        client.set_advanced(
-                            crop=s.get('crop', None),
-                            record_file=s.get('record_filename', None),
-                            record_format=s.get('record_format', 'mp4'),
-                            disable_screensaver=True
-                        )
-
-                        client.start()
-                        log_queue.put("Worker: Streaming Started!")
-
-                    except Exception as e:
-                        log_queue.put(f"Worker Error: {str(e)}")
-                        client = None
-
-                elif msg['action'] == 'STOP':
-                    if client:
-                        client.stop()
-                        client = None
-                        log_queue.put("Worker: Streaming Stopped.")
-                
-                elif msg['action'] == 'KILL':
-                    break
-
-            except queue.Empty: pass
-            
-            if client and client.process and client.process.poll() is not None:
-                log_queue.put("Worker Alert: Process ended unexpectedly.")
-                client = None
-
-        except Exception as e:
-            log_queue.put(f"Critical Worker Error: {e}")
+# GUI log pushes are coalesced over this window (seconds) or batch size.
+LOG_BATCH_WINDOW = 0.05
+LOG_BATCH_SIZE = 200
+# Threads available to blocking ADB work requested by the GUI.
+ADB_POOL_SIZE = 4
+# Time the worker gets on exit beyond stopping its sessions (ScrcpySessionManager.STOP_TIMEOUT).
+SHUTDOWN_MARGIN = 2
+# Device picker thumbnails: at most one screencap per device every THUMBNAIL_INTERVAL seconds.
+THUMBNAIL_INTERVAL = 10
+THUMBNAIL_CACHE_BYTES = 16 * 1024 * 1024
+# Startup budgets (seconds): launch to first page request, worker spawn to READY.
+GUI_STARTUP_BUDGET = float(os.environ.get('GUIPY_GUI_STARTUP_BUDGET') or 3.0)
+WORKER_READY_BUDGET = float(os.environ.get('GUIPY_WORKER_READY_BUDGET') or 1.5)
 
 # =========================================================
 # MAIN GUI PROCESS
 # =========================================================
 
-cmd_queue = multiprocessing.Queue()
-log_queue = multiprocessing.Queue()
+# Created in main(), so importing this module (as the spawned worker does) has no side effects.
+# For the same reason the wrapper, telemetry and tracing are imported where they are used.
+eel = None
+cmd_queue = None
+log_queue = None
+startup = {'started_at': None, 'worker_spawned_at': None, 'gui_ready': None, 'worker_ready': None}
+
+EXPOSED = []
+
+def expose(fn):
+    """Marks a function for eel.expose(); they are registered in main() once eel is imported."""
+    EXPOSED.append(fn)
+    return fn
+
+def check_startup_budget(name, elapsed, budget):
+    """Records a startup phase and warns (console and GUI log) when it exceeds its budget."""
+    startup[name] = round(elapsed, 3)
+    msg = f"Startup: {name.replace('_', ' ')} in {elapsed:.2f}s"
+    if elapsed > budget:
+        msg += f" (over the {budget}s budget)"
+        logging.getLogger("Startup").warning(msg)
+    else:
+        logging.getLogger("Startup").info(msg)
+    return msg
 
 def start_background_log_reader():
+    log = logging.getLogger("LogReader")
+
+    def push(fn, *args):
+        # A failed push (page closed, bad payload) loses that message, not the reader
+        try: fn(*args)
+        except Exception as e: log.warning(f"GUI push {getattr(fn, '__name__', fn)} failed: {e}")
+
     def runner():
         while True:
             try:
-                msg = log_queue.get()
-                eel.update_log(msg)
-            except: break
+                # Block for the first message, then coalesce whatever arrives in the window.
+                batch = [log_queue.get()]
+                deadline = time.monotonic() + LOG_BATCH_WINDOW
+                while len(batch) < LOG_BATCH_SIZE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0: break
+                    try: batch.append(log_queue.get(timeout=remaining))
+                    except queue.Empty: break
+            except (queue.Empty, EOFError, OSError):
+                break  # Queue closed: the app is exiting
+
+            lines = []
+            for msg in batch:
+                kind = msg.get('type') if isinstance(msg, dict) else None
+                if kind in ('sessions', 'metrics') and lines:
+                    # Keep the GUI in queue order: earlier log lines go out first
+                    push(eel.update_logs, lines)
+                    lines = []
+                if kind == 'sessions':
+                    push(eel.update_sessions, msg['sessions'])
+                elif kind == 'metrics':
+                    push(eel.update_metrics, msg['key'], msg['metrics'])
+                elif kind == 'telemetry':
+                    worker_metrics['snapshot'] = msg['metrics']
+                elif kind == 'ready':
+                    rss = f", RSS {msg['rss_bytes'] / 1048576:.1f} MB" if msg.get('rss_bytes') else ""
+                    lines.append(check_startup_budget('worker_ready', msg['ready_at'] - startup['worker_spawned_at'],
+                                                      WORKER_READY_BUDGET) + f" (pid {msg['pid']}{rss})")
+                else:
+                    lines.append(msg)
+            if lines: push(eel.update_logs, lines)
     t = threading.Thread(target=runner, daemon=True)
     t.start()
 
+# --- TELEMETRY ---
+
+worker_metrics = {'snapshot': None}
+gui_metrics = None
+
+def render_metrics():
+    """Worker session metrics (as last shipped) plus this process's adb latency and queue depths."""
+    import telemetry
+    for name, q in (('cmd', cmd_queue), ('log', log_queue)):
+        try: gui_metrics.set('guipy_queue_depth', q.qsize(), queue=name)
+        except NotImplementedError: pass  # macOS has no sem_getvalue()
+    return telemetry.render(worker_metrics['snapshot'], gui_metrics.snapshot())
+
+def start_metrics_server(port):
+    """Serves /metrics on localhost from the GUI process's gevent hub."""
+    global gui_metrics
+    import telemetry, tracing
+    from gevent.pywsgi import WSGIServer
+    gui_metrics = telemetry.Registry()
+    gui_metrics.gauge('guipy_queue_depth', 'Messages waiting in the worker queues.', ('queue',))
+    tracing.add_hook(telemetry.adb_latency_hook(gui_metrics, 'gui'))
+    server = WSGIServer(('127.0.0.1', port), telemetry.make_wsgi_app(render_metrics), log=None)
+    server.start()
+    logging.getLogger("Telemetry").info(f"Metrics on http://127.0.0.1:{port}/metrics")
+    return server
+
+# --- DEVICE TRACKING ---
+
+device_tracker = None
+device_tracker_env = None
+
+def push_device_event(event):
+    """Forwards tracker events to the GUI together with the current device list."""
+    tracker = device_tracker
+    if tracker:
+        event['devices'] = tracker.list_devices()
+    if event['event'] == 'removed' and thumbnail_service:
+        thumbnail_service.invalidate(event['device']['serial'])
+    eel.device_event(event)
+
+def ensure_device_tracker(env_path):
+    """Starts (or restarts for a new ENV) the track-devices listener. Returns True if it was already live."""
+    global device_tracker, device_tracker_env
+    from scrcpy_wrapper3v import DeviceTracker, get_client
+    if device_tracker and device_tracker_env == env_path and device_tracker.is_running():
+        return True
+    if device_tracker:
+        device_tracker.stop()
+    device_tracker = DeviceTracker(get_client(env_path), on_event=push_device_event)
+    device_tracker_env = env_path
+    device_tracker.start()
+    return False
+
+# --- ADB JOBS (off the Eel/gevent loop) ---
+
+adb_pool = None
+adb_jobs = {}
+
+def run_adb_job(key, fn, *args):
+    """
+    Runs a blocking ADB call on a native thread while the calling greenlet yields,
+    so the GUI server keeps serving. Identical in-flight jobs (same key) share one result.
+    """
+    job = adb_jobs.get(key)
+    if job is None:
+        job = adb_jobs[key] = adb_pool.spawn(fn, *args)
+    try:
+        return job.get()
+    finally:
+        if adb_jobs.get(key) is job: del adb_jobs[key]
+
+def scan_devices(env_path):
+    from scrcpy_wrapper3v import get_client
+    if ensure_device_tracker(env_path):
+        return device_tracker.list_devices()
+    # Tracker just started and has no snapshot yet: do one full scan.
+    return get_client(env_path).list_devices()
+
+# --- THUMBNAILS ---
+
+thumbnail_service = None
+thumbnail_env = None
+thumbnails_pushed = {}
+
+def get_thumbnail_service(env_path):
+    global thumbnail_service, thumbnail_env
+    from scrcpy_wrapper3v import ThumbnailService, get_client
+    if thumbnail_service is None or thumbnail_env != env_path:
+        thumbnail_service = ThumbnailService(get_client(env_path), ttl=THUMBNAIL_INTERVAL,
+                                             min_interval=THUMBNAIL_INTERVAL, max_bytes=THUMBNAIL_CACHE_BYTES)
+        thumbnail_env = env_path
+        thumbnails_pushed.clear()
+    return thumbnail_service
+
+def push_thumbnail(env_path, serial):
+    """Captures (or reuses) a device thumbnail and pushes it to the GUI if it has not seen it yet."""
+    try:
+        service = get_thumbnail_service(env_path)
+        thumb = run_adb_job(('thumbnail', env_path, serial), service.get, serial)
+    except Exception as e:
+        logging.getLogger("Thumbnails").warning(f"{serial}: {e}")
+        return
+    if thumb and thumbnails_pushed.get(serial) != thumb['captured_at']:
+        thumbnails_pushed[serial] = thumb['captured_at']
+        eel.update_thumbnail(serial, f"data:{thumb['mime']};base64,{base64.b64encode(thumb['data']).decode('ascii')}")
+
 # --- EEL EXPOSED FUNCTIONS ---
 
-@eel.expose
+@expose
 def adb_pair_py(path, ip, code):
-    """Pairs device using ADB Pair (Run on thread to prevent freeze)"""
+    """Pairs device using ADB Pair (runs on the ADB thread pool to prevent freeze)"""
+    from scrcpy_wrapper3v import get_client
     try:
-        env = path if path and path.strip() != "" else None
-        client = ScrcpyClient(ENV=env)
-        success = client.pair_device(ip, code)
+        client = get_client(path)
+        success = run_adb_job(('pair', path, ip, code), client.pair_device, ip, code)
         return {'success': success, 'message': 'Paired Successfully' if success else 'Pairing Failed (Check Log)'}
     except Exception as e:
         return {'success': False, 'message': str(e)}
 
-@eel.expose
+@expose
 def adb_connect_py(path, ip):
     """Connects to device using ADB Connect"""
+    from scrcpy_wrapper3v import get_client
     try:
-        env = path if path and path.strip() != "" else None
-        client = ScrcpyClient(ENV=env)
-        success = client.connect_device(ip)
+        client = get_client(path)
+        success = run_adb_job(('connect', path, ip), client.connect_device, ip)
         return {'success': success, 'message': 'Connected Successfully' if success else 'Connection Failed (Check Log)'}
     except Exception as e:
         return {'success': False, 'message': str(e)}
 
-@eel.expose
+@expose
+def adb_connect_many_py(path, ips):
+    """Connects several devices at once, with retries. Returns one result per endpoint."""
+    from scrcpy_wrapper3v import get_client
+    try:
+        client = get_client(path)
+        return {'success': True, 'results': run_adb_job(('connect_many', path, tuple(ips)), client.connect_many, ips)}
+    except Exception as e:
+        return {'success': False, 'message': str(e)}
+
+@expose
 def load_settings_py():
+    # First call from the page: the GUI is up
+    if startup['gui_ready'] is None:
+        log_queue.put(check_startup_budget('gui_ready', time.time() - startup['started_at'], GUI_STARTUP_BUDGET))
     if os.path.exists(SETTINGS_FILE):
         try:
             with open(SETTINGS_FILE, 'r') as f: return json.load(f)
         except: pass
     return {}
 
-@eel.expose
+@expose
 def get_devices_py(scrcpy_path):
     try:
         env_path = scrcpy_path if scrcpy_path and scrcpy_path.strip() != "" else None
-        client = ScrcpyClient(ENV=env_path, debug=False)
-        return {'success': True, 'devices': client.list_devices()}
+        return {'success': True, 'devices': run_adb_job(('devices', env_path), scan_devices, env_path)}
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
-@eel.expose
+@expose
+def request_thumbnails_py(scrcpy_path, serials, resend=False):
+    """Refreshes thumbnails in the background; they are delivered to the GUI via update_thumbnail."""
+    env_path = scrcpy_path if scrcpy_path and scrcpy_path.strip() != "" else None
+    if resend: thumbnails_pushed.clear()
+    for serial in serials:
+        eel.spawn(push_thumbnail, env_path, serial)
+    return {'success': True}
+
+@expose
 def start_scrcpy_py(settings):
     try:
         with open(SETTINGS_FILE, 'w') as f: json.dump(settings, f, indent=4)
@@ -194,21 +273,49 @@ def start_scrcpy_py(settings):
     cmd_queue.put({'action': 'START', 'data': settings})
     return {'success': True}
 
-@eel.expose
-def stop_scrcpy_py():
-    cmd_queue.put({'action': 'STOP'})
+@expose
+def stop_scrcpy_py(serial=None):
+    """Stops one session by serial/endpoint, or all sessions when omitted."""
+    cmd_queue.put({'action': 'STOP', 'serial': serial})
     return {'success': True}
 
-if __name__ == '__main__':
+@expose
+def session_status_py(serial=None):
+    """Requests a status report; it is delivered to the GUI via update_sessions."""
+    cmd_queue.put({'action': 'STATUS', 'serial': serial})
+    return {'success': True}
+
+def main():
+    global eel, cmd_queue, log_queue, adb_pool
+    startup['started_at'] = time.time()
     multiprocessing.freeze_support()
-    worker = multiprocessing.Process(target=scrcpy_worker_process, args=(cmd_queue, log_queue))
+    import eel
+    from gevent.threadpool import ThreadPool
+    eel.init('GUI')
+    for fn in EXPOSED: eel.expose(fn)
+    adb_pool = ThreadPool(ADB_POOL_SIZE)
+
+    # A spawned worker starts a fresh interpreter that re-runs this module's top level
+    # (stdlib and worker.py only) and then loads the wrapper, instead of inheriting
+    # (fork) the GUI's Eel/gevent/bottle memory.
+    ctx = multiprocessing.get_context('spawn')
+    cmd_queue, log_queue = ctx.Queue(), ctx.Queue()
+    worker = ctx.Process(target=scrcpy_worker_process, args=(cmd_queue, log_queue))
     worker.daemon = True
+    startup['worker_spawned_at'] = time.time()
     worker.start()
     start_background_log_reader()
+    if METRICS_PORT: start_metrics_server(METRICS_PORT)
     
     try:
         eel.start('index.html', size=(900, 700), port=0, block=True, geometry={'resizable': False})
     except: pass
     finally:
+        if device_tracker: device_tracker.stop()
         cmd_queue.put({'action': 'KILL'})
-        worker.terminate()
\ No newline at end of file
+        from scrcpy_wrapper3v import ScrcpySessionManager
+        worker.join(ScrcpySessionManager.STOP_TIMEOUT + SHUTDOWN_MARGIN)
+        if worker.is_alive(): worker.terminate()
+
+if __name__ == '__main__':
+    main()
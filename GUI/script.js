@@ -1,10 +1,14 @@
 let isRunning = false;
 let connectionMode = 'usb';
+const THUMBNAIL_REFRESH_MS = 10000;
+const thumbnails = {};
+let thumbnailsRequested = false;
 
 window.onload = async function() {
     await loadSavedSettings();
     setMode('usb'); // Default
     fetchDevices();
+    setInterval(requestThumbnails, THUMBNAIL_REFRESH_MS);
 };
 
 window.addEventListener("resize", function() {
@@ -52,7 +56,10 @@ async function loadSavedSettings() {
 
     // Adv
     setVal('crop', s.crop); setVal('record_filename', s.record_filename);
-    setVal('record_format', s.record_format);
+    setVal('record_format', s.record_format); setCheck('print_fps', s.print_fps);
+    setCheck('auto_restart', s.auto_restart); setCheck('auto_transport', s.auto_transport);
+    setCheck('headless_record', s.headless_record); setVal('record_dir', s.record_dir);
+    setVal('segment_minutes', s.segment_minutes); setVal('record_quota_gb', s.record_quota_gb);
 
     // Switch mode if IP was saved
     if(s.tcp_ip && s.tcp_ip.length > 5) setMode('tcp');
@@ -97,6 +104,16 @@ async function adbConnect() {
 
     if(!ip) { log("Error: Enter Device IP (e.g. 192.168.1.5:5555)"); return; }
 
+    // Several endpoints separated by commas/spaces are connected in one batch
+    const ips = ip.split(/[\s,;]+/).filter(x => x);
+    if (ips.length > 1) {
+        log(`Connecting ${ips.length} devices...`);
+        let res = await eel.adb_connect_many_py(path, ips)();
+        if (!res.success) { log(res.message); return; }
+        res.results.forEach(r => log(`${r.endpoint}: ${r.success ? "connected" : "FAILED"} (${r.attempts} attempt(s), ${r.latency}s)`));
+        return;
+    }
+
     log(`Attempting to connect to ${ip}...`);
     let res = await eel.adb_connect_py(path, ip)();
     log(res.message);
@@ -110,22 +127,66 @@ async function fetchDevices() {
     select.innerHTML = "<option>Scanning...</option>";
 
     let response = await eel.get_devices_py(path)();
+    if (response.success) {
+        renderDevices(response.devices);
+        log(response.devices.length > 0 ? `Found ${response.devices.length} USB devices.` : "No USB devices found.");
+    } else {
+        renderDevices([]);
+        log("No USB devices found.");
+    }
+}
+
+function renderDevices(devices) {
+    const select = document.getElementById('device_select');
+    const selected = select.value;
     select.innerHTML = "";
 
-    if (response.success && response.devices.length > 0) {
-        response.devices.forEach(dev => {
+    if (devices.length > 0) {
+        devices.forEach(dev => {
             let opt = document.createElement('option');
             opt.value = dev.serial;
             opt.text = `${dev.model} (${dev.serial})`;
             select.appendChild(opt);
         });
-        log(`Found ${response.devices.length} USB devices.`);
+        if (devices.some(dev => dev.serial === selected)) select.value = selected;
     } else {
         let opt = document.createElement('option');
         opt.text = "No USB devices found";
         select.appendChild(opt);
-        log("No USB devices found.");
     }
+    showThumbnail();
+    requestThumbnails();
+}
+
+// Thumbnails are captured in Python (throttled and cached per device) and pushed back
+function requestThumbnails() {
+    const serials = Array.from(document.getElementById('device_select').options)
+        .map(opt => opt.value).filter(v => v);
+    if (serials.length === 0) return;
+    eel.request_thumbnails_py(document.getElementById('env_path').value, serials, !thumbnailsRequested);
+    thumbnailsRequested = true;
+}
+
+eel.expose(update_thumbnail);
+function update_thumbnail(serial, dataUrl) {
+    thumbnails[serial] = dataUrl;
+    if (document.getElementById('device_select').value === serial) showThumbnail();
+}
+
+function showThumbnail() {
+    const img = document.getElementById('device_thumb');
+    const src = thumbnails[document.getElementById('device_select').value];
+    if (src) { img.src = src; img.style.display = 'block'; }
+    else img.style.display = 'none';
+}
+
+// Pushed by the Python device tracker on plug/unplug/state change
+eel.expose(device_event);
+function device_event(evt) {
+    renderDevices(evt.devices || []);
+    if (evt.event === 'added') log(`Device connected: ${evt.device.serial} (${evt.device.state})`);
+    else if (evt.event === 'removed') log(`Device disconnected: ${evt.device.serial}`);
+    else if (evt.device.state !== 'device') log(`Device ${evt.device.serial}: ${evt.device.state}`);
 }
 
 async function toggleScrcpy() {
@@ -186,6 +247,13 @@ async function start() {
         crop: document.getElementById('crop').value,
         record_filename: document.getElementById('record_filename').value,
         record_format: document.getElementById('record_format').value,
+        print_fps: document.getElementById('print_fps').checked,
+        auto_restart: document.getElementById('auto_restart').checked,
+        auto_transport: document.getElementById('auto_transport').checked,
+        headless_record: document.getElementById('headless_record').checked,
+        record_dir: document.getElementById('record_dir').value,
+        segment_minutes: document.getElementById('segment_minutes').value,
+        record_quota_gb: document.getElementById('record_quota_gb').value,
     };
 
     if (connectionMode === 'usb' && (s.serial === "No USB devices found" || !s.serial)) {
@@ -226,15 +294,49 @@ function setUIState(running) {
         btnStop.style.display = 'none';
         status.innerText = "Ready";
         status.style.color = "#a0a0a0";
+        document.getElementById('metrics_text').innerText = "";
     }
 }
 
+const MAX_LOG_LINES = 1000;
+
 eel.expose(update_log);
-function update_log(msg) {
+function update_log(msg) { update_logs([msg]); }
+
+// Batched log push from Python; keeps only the last MAX_LOG_LINES entries
+eel.expose(update_logs);
+function update_logs(msgs) {
     const container = document.getElementById('log-container');
-    const div = document.createElement('div');
-    div.innerText = `>> ${msg}`;
-    container.appendChild(div);
+    const fragment = document.createDocumentFragment();
+    msgs.forEach(msg => {
+        const div = document.createElement('div');
+        div.innerText = `>> ${msg}`;
+        fragment.appendChild(div);
+    });
+    container.appendChild(fragment);
+    while (container.childElementCount > MAX_LOG_LINES) container.removeChild(container.firstChild);
     container.scrollTop = container.scrollHeight;
 }
-function log(msg) { update_log(msg); }
\ No newline at end of file
+function log(msg) { update_log(msg); }
+
+// Session status report requested with eel.session_status_py()
+eel.expose(update_sessions);
+function update_sessions(sessions) {
+    if (sessions.length === 0) { log("No active sessions."); return; }
+    const mb = (b) => b == null ? "?" : (b / 1048576).toFixed(1);
+    sessions.forEach(ss => {
+        if (ss.recording) {
+            const r = ss.recording;
+            log(`[${ss.key}] recording: ${r.segments} segment(s), ${mb(r.bytes_written)} MB @ ${(r.throughput_bps / 1024).toFixed(0)} KB/s`);
+        }
+        log(`[${ss.key}] pid ${ss.pid} ${ss.state} | up ${ss.uptime}s | restarts ${ss.restarts} (down ${ss.downtime}s) | CPU ${ss.cpu_percent ?? "?"}% | RSS ${mb(ss.rss_bytes)} MB`);
+    });
+}
+
+// Stream metrics pushed once per FPS report (requires "Show Stream Metrics")
+eel.expose(update_metrics);
+function update_metrics(key, m) {
+    const ttff = m.time_to_first_frame != null ? ` | first frame ${m.time_to_first_frame}s` : "";
+    document.getElementById('metrics_text').innerText =
+        `${key}: ${m.fps_last} fps (p50 ${m.fps_p50}, p95 ${m.fps_p95}) | skipped ${m.skipped_window}${ttff}`;
+}
\ No newline at end of file
@@ -0,0 +1,205 @@
+import os
+import socket
+import logging
+from typing import Callable, Dict, Iterator, List, Optional
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADB_HOST = "127.0.0.1"
+DEFAULT_ADB_PORT = 5037
+
+
+class AdbProtocolError(Exception):
+    """Raised when the adb server answers a request with FAIL."""
+
+
+class AdbSocketClient:
+    """
+    Minimal client for the adb server "smart socket" protocol (TCP 5037).
+    Talks to the already running adb server instead of forking the adb binary.
+
+    Every request is "<4 hex digits length><payload>" and is answered with
+    OKAY or FAIL. The server closes host service connections after replying,
+    so each call opens its own (loopback) connection.
+    """
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, timeout: float = 5.0):
+        self.host = host or DEFAULT_ADB_HOST
+        self.port = int(port or os.environ.get("ANDROID_ADB_SERVER_PORT") or DEFAULT_ADB_PORT)
+        self.timeout = timeout
+
+    @classmethod
+    def probe(cls, host: Optional[str] = None, port: Optional[int] = None,
+              timeout: float = 0.5) -> Optional["AdbSocketClient"]:
+        """Returns a client if an adb server answers on host:port, otherwise None."""
+        client = cls(host, port)
+        try:
+            version = client.version(timeout=timeout)
+            logger.debug(f"Using adb server protocol on {client.host}:{client.port} (version {version})")
+            return client
+        except (OSError, AdbProtocolError) as e:
+            logger.debug(f"adb server not reachable on {client.host}:{client.port}: {e}")
+            return None
+
+    # --- Wire helpers ---
+
+    def _open(self, timeout: Optional[float]) -> socket.socket:
+        return socket.create_connection((self.host, self.port), timeout=timeout or self.timeout)
+
+    @staticmethod
+    def _recv_exact(sock: socket.socket, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("adb server closed the connection")
+            data += chunk
+        return data
+
+    @classmethod
+    def _read_block(cls, sock: socket.socket) -> str:
+        header = cls._recv_exact(sock, 4)
+        try:
+            size = int(header, 16)
+        except ValueError:
+            raise AdbProtocolError(f"Malformed adb server reply: {header!r}")
+        return cls._recv_exact(sock, size).decode("utf-8", errors="replace")
+
+    @staticmethod
+    def _read_raw(sock: socket.socket) -> bytes:
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    @classmethod
+    def _read_all(cls, sock: socket.socket) -> str:
+        return cls._read_raw(sock).decode("utf-8", errors="replace")
+
+    @classmethod
+    def _send(cls, sock: socket.socket, request: str):
+        payload = request.encode("utf-8")
+        sock.sendall(b"%04x" % len(payload) + payload)
+        status = cls._recv_exact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbProtocolError(cls._read_block(sock))
+        raise AdbProtocolError(f"Unexpected adb server status: {status!r}")
+
+    def _query(self, request: str, timeout: Optional[float] = None) -> str:
+        """Sends a host request whose answer is a single length-prefixed block."""
+        # Serials may contain colons ("192.168.1.5:5555"), so a host-serial service is the last field
+        name = request.rsplit(":", 1)[1] if request.startswith("host-serial:") else request.split(":")[1]
+        with tracing.span("adb-socket", name, [request]) as record, self._open(timeout) as sock:
+            self._send(sock, request)
+            answer = self._read_block(sock)
+            record["output_bytes"] = len(answer)
+            return answer
+
+    # --- Host services ---
+
+    def version(self, timeout: Optional[float] = None) -> int:
+        return int(self._query("host:version", timeout), 16)
+
+    def devices(self, timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        """
+        Lists devices known to the server ("host:devices-l").
+        :return: [{"serial": ..., "state": ..., <extra key:value fields>}, ...]
+        """
+        return parse_devices(self._query("host:devices-l", timeout))
+
+    def get_state(self, serial: str, timeout: Optional[float] = None) -> str:
+        return self._query(f"host-serial:{serial}:get-state", timeout).strip()
+
+    def connect(self, device_ip_port: str, timeout: Optional[float] = None) -> str:
+        return self._query(f"host:connect:{device_ip_port}", timeout).strip()
+
+    def pair(self, device_ip_port: str, pair_code: str, timeout: Optional[float] = None) -> str:
+        return self._query(f"host:pair:{pair_code}:{device_ip_port}", timeout).strip()
+
+    def track_devices(self) -> socket.socket:
+        """
+        Opens a "host:track-devices-l" stream. The server pushes the full device
+        list every time it changes; read it with iter_device_updates(sock.recv).
+        """
+        sock = self._open(None)
+        try:
+            self._send(sock, "host:track-devices-l")
+        except Exception:
+            sock.close()
+            raise
+        sock.settimeout(None)
+        return sock
+
+    # --- Device services ---
+
+    def shell(self, serial: str, command: str, timeout: Optional[float] = None) -> str:
+        """Runs a shell command on the device and returns its output."""
+        with tracing.span("adb-socket", "shell", [f"host:transport:{serial}", f"shell:{command}"]) as record, \
+                self._open(timeout) as sock:
+            self._send(sock, f"host:transport:{serial}")
+            self._send(sock, f"shell:{command}")
+            output = self._read_all(sock)
+            record["output_bytes"] = len(output)
+            return output
+
+    def exec_out(self, serial: str, command: str, timeout: Optional[float] = None) -> bytes:
+        """Runs a command without a pty ("adb exec-out") and returns its raw stdout."""
+        with tracing.span("adb-socket", "exec-out", [f"host:transport:{serial}", f"exec:{command}"]) as record, \
+                self._open(timeout) as sock:
+            self._send(sock, f"host:transport:{serial}")
+            self._send(sock, f"exec:{command}")
+            output = self._read_raw(sock)
+            record["output_bytes"] = len(output)
+            return output
+
+
+def parse_devices(block: str) -> List[Dict[str, str]]:
+    """Parses the body of a "devices"/"devices-l"/"track-devices" answer."""
+    devices = []
+    for line in block.splitlines():
+        parts = line.split()
+        if len(parts) < 2:
+            continue
+        info = {"serial": parts[0], "state": parts[1]}
+        for field in parts[2:]:
+            key, sep, value = field.partition(":")
+            if sep:
+                info[key] = value
+        devices.append(info)
+    return devices
+
+
+def iter_device_updates(read: Callable[[int], bytes]) -> Iterator[List[Dict[str, str]]]:
+    """
+    Yields parsed device lists from a track-devices stream, as produced by the
+    adb server socket or by "adb track-devices". Stops at end of stream.
+    :param read: Function returning up to n bytes, b"" at end of stream
+    """
+    def read_exact(size: int) -> Optional[bytes]:
+        data = b""
+        while len(data) < size:
+            chunk = read(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    while True:
+        header = read_exact(4)
+        if header is None:
+            return
+        try:
+            size = int(header, 16)
+        except ValueError:
+            raise AdbProtocolError(f"Malformed track-devices header: {header!r}")
+        body = read_exact(size) if size else b""
+        if body is None:
+            return
+        yield parse_devices(body.decode("utf-8", errors="replace"))
@@ -0,0 +1,269 @@
+"""
+Fake adb/scrcpy executables for benchmarks. install() writes them into a
+folder usable as a ScrcpyClient ENV; their behaviour comes from the
+fake_config.json written next to them, so it can change between runs.
+FakeAdbServer serves the same devices over the adb server protocol.
+"""
+import json
+import os
+import re
+import socketserver
+import stat
+import sys
+import threading
+import time
+
+FAKE_ADB = r'''
+import json, os, re, sys, time
+
+cfg = json.load(open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_config.json")))
+args = sys.argv[1:]
+time.sleep(cfg["adb_latency"])
+# serial -> ro.serialno: USB devices, then Wi-Fi endpoints of the first tcp_devices of them
+devices = {f"emulator-{5554 + 2 * i}": f"FAKE{i:04d}" for i in range(cfg["devices"])}
+devices.update({f"192.168.100.{i + 1}:5555": f"FAKE{i:04d}" for i in range(min(cfg["tcp_devices"], cfg["devices"]))})
+
+if args[:1] == ["version"]:
+    print("Android Debug Bridge version 1.0.41")
+elif args[:1] == ["devices"]:
+    print("List of devices attached")
+    for serial in devices:
+        print(f"{serial}\tdevice")
+    print()
+elif args[:1] == ["connect"]:
+    print(f"connected to {args[1]}")
+elif args[:1] == ["pair"]:
+    if args[2:3] != [cfg["pair_code"]]:
+        print("Failed: Wrong password or connection was dropped.")
+        sys.exit(1)
+    print(f"Successfully paired to {args[1]}")
+elif args[:1] == ["-s"] and args[1] in devices:
+    time.sleep(cfg["shell_latency"])
+    if args[2] == "get-state":
+        print("device")
+    elif args[2] == "shell":
+        values = {"ro.product.brand": "Fake", "ro.product.model": "Bench Phone",
+                  "ro.build.version.sdk": "34", "ro.product.cpu.abi": "x86_64", "ro.serialno": devices[args[1]]}
+        for name in args[3].split("getprop ")[1:]:
+            print(values.get(name.split(")")[0], ""))
+        if args[3] == "echo":
+            print()
+    elif args[2] == "exec-out":
+        dd = re.search(r"bs=(\d+) count=(\d+)", args[3])
+        size = int(dd.group(1)) * int(dd.group(2)) if dd else 0
+        if ":" in args[1] and cfg["tcp_throughput"]:
+            time.sleep(size / cfg["tcp_throughput"])
+        sys.stdout.buffer.write(bytes(size))
+else:
+    print(f"error: device not found ({' '.join(args)})", file=sys.stderr)
+    sys.exit(1)
+'''
+
+FAKE_SCRCPY = r'''
+import json, os, signal, sys, time
+
+cfg = json.load(open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_config.json")))
+args = sys.argv[1:]
+if "--version" in args:
+    print("scrcpy 2.4 <https://github.com/Genymobile/scrcpy>")
+    sys.exit(0)
+if "--help" in args:
+    print("\n".join(["--max-size", "--max-fps", "--video-bit-rate", "--print-fps", "--no-window",
+                     "--no-playback", "--no-control", "--record", "--record-format", "--serial"]))
+    sys.exit(0)
+
+def on_interrupt(signum, frame):
+    time.sleep(cfg["scrcpy_stop_latency"])
+    sys.exit(0)
+
+signal.signal(signal.SIGINT, on_interrupt)
+signal.signal(signal.SIGTERM, on_interrupt)
+print("INFO: scrcpy 2.4 <https://github.com/Genymobile/scrcpy>", flush=True)
+time.sleep(cfg["scrcpy_startup"])
+print("INFO: Renderer: opengl", flush=True)
+print("INFO: Texture: 1080x2400", flush=True)
+
+started = last_report = time.monotonic()
+while True:
+    time.sleep(0.02)
+    now = time.monotonic()
+    if "--print-fps" in args and now - last_report >= 1:
+        print("INFO: 60 fps", flush=True)
+        last_report = now
+    if cfg["crash_after"] and now - started >= cfg["crash_after"]:
+        print("ERROR: Device disconnected", flush=True)
+        sys.exit(1)
+'''
+
+DEFAULT_CONFIG = {
+    "devices": 1,
+    "adb_latency": 0.0,       # seconds added to every adb binary invocation
+    "shell_latency": 0.0,     # extra seconds for per-device calls (shell, get-state)
+    "scrcpy_startup": 0.0,    # seconds before the first frame is reported
+    "scrcpy_stop_latency": 0.0,
+    "crash_after": 0,         # scrcpy exits with 1 after this many seconds (0 = never)
+    "tcp_devices": 0,         # the first N devices are also connected over Wi-Fi (192.168.100.<n>:5555)
+    "tcp_throughput": 0,      # bytes/s of exec-out transfers over Wi-Fi (0 = unlimited)
+    "pair_code": "123456",    # the only code "adb pair" accepts
+    # FakeAdbServer only: endpoint -> connect attempts that fail before one succeeds,
+    # and endpoints whose connect request is never answered
+    "connect_failures": {},
+    "connect_hang": [],
+}
+
+
+def configure(folder: str, **config) -> dict:
+    """Rewrites the fakes' behaviour; unknown keys are rejected."""
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown fake option(s): {', '.join(sorted(unknown))}")
+    cfg = dict(DEFAULT_CONFIG, **config)
+    with open(os.path.join(folder, "fake_config.json"), "w") as f:
+        json.dump(cfg, f)
+    return cfg
+
+
+def install(folder: str, **config) -> str:
+    """Writes fake "adb" and "scrcpy" executables into folder and returns it."""
+    os.makedirs(folder, exist_ok=True)
+    for name, source in (("adb", FAKE_ADB), ("scrcpy", FAKE_SCRCPY)):
+        path = os.path.join(folder, name)
+        with open(path, "w") as f:
+            f.write(f"#!{sys.executable}\n{source}")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    configure(folder, **config)
+    return folder
+
+
+PROPS = {"ro.product.brand": "Fake", "ro.product.model": "Bench Phone",
+         "ro.build.version.sdk": "34", "ro.product.cpu.abi": "x86_64"}
+
+
+def device_serials(cfg: dict) -> dict:
+    """serial -> ro.serialno, as the fake adb binary reports them (USB serials first)."""
+    devices = {f"emulator-{5554 + 2 * i}": f"FAKE{i:04d}" for i in range(cfg["devices"])}
+    devices.update({f"192.168.100.{i + 1}:5555": f"FAKE{i:04d}"
+                    for i in range(min(cfg["tcp_devices"], cfg["devices"]))})
+    return devices
+
+
+class _SmartSocketHandler(socketserver.BaseRequestHandler):
+    """One client connection: host requests, or host:transport followed by one device service."""
+
+    def read_request(self):
+        header = self.read_exact(4)
+        if not header:
+            return None
+        return self.read_exact(int(header, 16)).decode("utf-8")
+
+    def read_exact(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return b""
+            data += chunk
+        return data
+
+    def reply(self, body: str):
+        data = body.encode("utf-8")
+        self.request.sendall(b"OKAY" + b"%04x" % len(data) + data)
+
+    def fail(self, message: str):
+        data = message.encode("utf-8")
+        self.request.sendall(b"FAIL" + b"%04x" % len(data) + data)
+
+    def handle(self):
+        cfg = self.server.config()
+        serials = device_serials(cfg)
+        transport = None
+        while True:
+            request = self.read_request()
+            if request is None:
+                return
+            if request == "host:version":
+                return self.reply("0029")
+            if request in ("host:devices", "host:devices-l"):
+                return self.reply("".join(f"{serial}\tdevice\n" for serial in serials))
+            if request.startswith("host:pair:"):
+                code, address = request[len("host:pair:"):].split(":", 1)
+                if code != cfg["pair_code"]:
+                    return self.reply("Failed: Wrong password or connection was dropped.")
+                return self.reply(f"Successfully paired to {address} [guid=adb-FAKE]")
+            if request.startswith("host:connect:"):
+                address = request.split(":", 2)[2]
+                if address in cfg["connect_hang"]:
+                    self.request.recv(1)  # until the client gives up
+                    return
+                if self.server.count_connect(address) <= cfg["connect_failures"].get(address, 0):
+                    return self.reply(f"failed to connect to {address}")
+                return self.reply(f"connected to {address}")
+            if request.startswith("host-serial:"):
+                serial, service = request[len("host-serial:"):].rsplit(":", 1)
+                if serial not in serials:
+                    return self.fail(f"device '{serial}' not found")
+                time.sleep(cfg["shell_latency"])
+                return self.reply("device" if service == "get-state" else "")
+            if request.startswith("host:transport:"):
+                transport = request[len("host:transport:"):]
+                if transport not in serials:
+                    return self.fail(f"device '{transport}' not found")
+                self.request.sendall(b"OKAY")
+                continue
+            if transport and request.startswith(("shell:", "exec:")):
+                time.sleep(cfg["shell_latency"])
+                output = self.run_command(request.split(":", 1)[1], serials[transport])
+                if ":" in transport and cfg["tcp_throughput"]:
+                    time.sleep(len(output) / cfg["tcp_throughput"])
+                self.request.sendall(b"OKAY" + output)
+                return
+            return self.fail(f"unknown service {request}")
+
+    @staticmethod
+    def run_command(command: str, serialno: str) -> bytes:
+        if "getprop " in command:
+            values = dict(PROPS, **{"ro.serialno": serialno})
+            return "".join(values.get(name.split(")")[0], "") + "\n" for name in command.split("getprop ")[1:]).encode()
+        dd = re.search(r"bs=(\d+) count=(\d+)", command)
+        if dd:
+            return bytes(int(dd.group(1)) * int(dd.group(2)))
+        return b"\n" if command == "echo" else b""
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """
+    adb server ("smart socket" protocol) on 127.0.0.1 for the devices in
+    folder's fake_config.json. Point ANDROID_ADB_SERVER_PORT at .port to use it.
+
+        with FakeAdbServer(folder) as server:
+            os.environ["ANDROID_ADB_SERVER_PORT"] = str(server.port)
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    # Parallel list_devices opens a connection per device at once
+    request_queue_size = 128
+
+    def __init__(self, folder: str):
+        super().__init__(("127.0.0.1", 0), _SmartSocketHandler)
+        self.folder = folder
+        self.port = self.server_address[1]
+        # endpoint -> connect requests received (see connect_failures)
+        self.connect_attempts = {}
+        self._lock = threading.Lock()
+
+    def count_connect(self, address: str) -> int:
+        with self._lock:
+            self.connect_attempts[address] = self.connect_attempts.get(address, 0) + 1
+            return self.connect_attempts[address]
+
+    def config(self) -> dict:
+        with open(os.path.join(self.folder, "fake_config.json")) as f:
+            return json.load(f)
+
+    def __enter__(self) -> "FakeAdbServer":
+        threading.Thread(target=self.serve_forever, name="FakeAdbServer", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
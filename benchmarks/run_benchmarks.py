@@ -0,0 +1,336 @@
+"""
+Offline benchmarks for ScrcpyClient, ScrcpySessionManager and the GUI worker,
+run against the fake adb/scrcpy and adb server from fakes.py (Linux).
+
+    python benchmarks/run_benchmarks.py                  # compare with baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline  # record this machine's numbers
+
+Every result is a median duration in seconds (lower is better). A result more
+than --threshold (and --min-delta seconds) slower than its baseline is a
+regression (exit code 1). Baselines are machine-specific.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from multiprocessing.connection import wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fakes
+from scrcpy_wrapper3v import RestartPolicy, ScrcpyClient, ScrcpySessionManager, _probe_cache, stop_all_processes
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+# Slowdowns smaller than this (seconds) are scheduling noise, whatever their percentage
+MIN_DELTA = 0.02
+DEVICE_COUNTS = (1, 8, 32)
+WORKER_SESSIONS = 8
+
+# Nothing listens here, so clients fall back to the fake adb binary immediately
+# instead of talking to a real adb server on 5037.
+NO_ADB_SERVER_PORT = "9"
+os.environ["ANDROID_ADB_SERVER_PORT"] = NO_ADB_SERVER_PORT
+
+# Fake settings applied to every benchmark (from the command line)
+FAKE_OVERRIDES = {}
+
+
+def configure(env: str, **config):
+    fakes.configure(env, **dict(FAKE_OVERRIDES, **config))
+
+
+def median_time(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def wait_until(predicate, timeout: float = 10.0, interval: float = 0.001):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Benchmark condition not reached")
+        time.sleep(interval)
+
+
+def bench_list_devices(env: str, repeats: int) -> dict:
+    results = {}
+    for count in DEVICE_COUNTS:
+        configure(env, devices=count)
+        client = ScrcpyClient(ENV=env, use_adb_server=False)
+
+        def run():
+            found = client.list_devices()
+            assert len(found) == count, f"expected {count} devices, got {len(found)}"
+
+        results[f"list_devices[{count}]"] = median_time(run, repeats)
+    return results
+
+
+def bench_list_devices_socket(env: str, repeats: int) -> dict:
+    """list_devices through the adb server protocol (the default when a server is running)."""
+    results = {}
+    with fakes.FakeAdbServer(env) as server:
+        os.environ["ANDROID_ADB_SERVER_PORT"] = str(server.port)
+        try:
+            for count in DEVICE_COUNTS:
+                configure(env, devices=count)
+                client = ScrcpyClient(ENV=env)
+                assert client._adb_server(), "fake adb server not reachable"
+
+                def run():
+                    found = client.list_devices()
+                    assert len(found) == count, f"expected {count} devices, got {len(found)}"
+                    assert found[0]["model"] == "Bench Phone", "device properties not read"
+
+                results[f"list_devices_socket[{count}]"] = median_time(run, repeats)
+        finally:
+            os.environ["ANDROID_ADB_SERVER_PORT"] = NO_ADB_SERVER_PORT
+    return results
+
+
+def bench_probe_transports(env: str, repeats: int) -> dict:
+    """
+    USB vs Wi-Fi probe of one device reachable both ways, Wi-Fi capped at 16 Mbit/s.
+    Runs over the fake adb server: the fake binary's startup time would swamp the transfers.
+    """
+    configure(env, devices=1, tcp_devices=1, tcp_throughput=2_000_000)
+    probes, lookups = [], []
+    with fakes.FakeAdbServer(env) as server:
+        os.environ["ANDROID_ADB_SERVER_PORT"] = str(server.port)
+        try:
+            client = ScrcpyClient(ENV=env)
+            for _ in range(repeats):
+                _probe_cache.clear()
+                started = time.perf_counter()
+                probe = client.probe_transports("192.168.100.1:5555", samples=3, payload_bytes=256 * 1024)
+                probes.append(time.perf_counter() - started)
+                assert probe and not probe["cached"], "probe failed"
+                assert (probe["device"], probe["best"], probe["type"]) == ("FAKE0000", "emulator-5554", "usb"), probe
+                assert probe["video"] == {"bitrate": "16M", "max_size": 0, "fps": 60}, probe["video"]
+                assert {t["type"] for t in probe["transports"]} == {"usb", "tcp"}, probe["transports"]
+
+                # Any serial of the device finds the cached result
+                started = time.perf_counter()
+                cached = client.probe_transports("emulator-5554")
+                lookups.append(time.perf_counter() - started)
+                assert cached["cached"] and cached["best"] == probe["best"], cached
+        finally:
+            os.environ["ANDROID_ADB_SERVER_PORT"] = NO_ADB_SERVER_PORT
+            _probe_cache.clear()
+            configure(env, devices=1)
+    return {"probe_transports": statistics.median(probes), "probe_transports_cached": statistics.median(lookups)}
+
+
+def bench_connect_many(env: str, repeats: int) -> dict:
+    """
+    connect_many over the fake adb server: plain, flaky, refused, paired, wrong pair
+    code and unresponsive endpoints, with retries and backoff.
+    """
+    timeout, retries, backoff = 0.3, 2, 0.05
+    configure(env, connect_failures={"10.0.0.2:5555": 2, "10.0.0.3:5555": 99}, connect_hang=["10.0.0.6:5555"])
+    endpoints = ["10.0.0.1:5555", "10.0.0.2:5555", "10.0.0.3:5555",
+                 {"endpoint": "10.0.0.4:5555", "pair_endpoint": "10.0.0.4:37000", "pair_code": "123456"},
+                 {"endpoint": "10.0.0.5:5555", "pair_code": "000000"},
+                 "10.0.0.6:5555"]
+    expected = [(True, None, 1), (True, None, 3), (False, None, 3),
+                (True, True, 1), (False, False, 3), (False, None, 3)]
+    # Unresponsive endpoint: every attempt times out once (no second timeout through the binary)
+    hang_budget = (retries + 1) * timeout + backoff * (2 ** retries - 1) + 0.5
+    samples = []
+    with fakes.FakeAdbServer(env) as server:
+        os.environ["ANDROID_ADB_SERVER_PORT"] = str(server.port)
+        try:
+            client = ScrcpyClient(ENV=env)
+            for _ in range(repeats):
+                server.connect_attempts.clear()
+                started = time.perf_counter()
+                results = client.connect_many(endpoints, timeout=timeout, retries=retries, backoff=backoff)
+                samples.append(time.perf_counter() - started)
+                got = [(r["success"], r["paired"], r["attempts"]) for r in results]
+                assert got == expected, got
+                assert results[1]["latency"] >= backoff * 3, results[1]
+                assert results[5]["latency"] < hang_budget, results[5]
+        finally:
+            os.environ["ANDROID_ADB_SERVER_PORT"] = NO_ADB_SERVER_PORT
+            configure(env, devices=1)
+    return {f"connect_many[{len(endpoints)}]": statistics.median(samples)}
+
+
+def bench_start_stop(env: str, repeats: int) -> dict:
+    configure(env, devices=1)
+    to_frame, stops = [], []
+    for _ in range(repeats):
+        client = ScrcpyClient(ENV=env, use_adb_server=False)
+        client.set_connection(serial="emulator-5554")
+        started = time.perf_counter()
+        client.start(preflight=False)
+        wait_until(lambda: client.timings.get("first_frame") is not None)
+        to_frame.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        client.stop(grace=2.0)
+        stops.append(time.perf_counter() - started)
+    return {"start_to_first_frame": statistics.median(to_frame), "stop": statistics.median(stops)}
+
+
+def bench_restart(env: str, repeats: int) -> dict:
+    """Crash detection to relaunch, without backoff: get-state check + respawn."""
+    configure(env, devices=1, crash_after=0.2)
+    manager = ScrcpySessionManager()
+    policy = RestartPolicy(base_delay=0, jitter=0, max_restarts=repeats + 1)
+    client = ScrcpyClient(ENV=env, use_adb_server=False)
+    client.set_connection(serial="emulator-5554")
+    samples = []
+    try:
+        manager.start("bench", client, restart_policy=policy)
+        for _ in range(repeats):
+            sentinels = manager.sentinels()
+            if sentinels:
+                wait(sentinels, 5.0)
+            else:
+                wait_until(lambda: client.process.poll() is not None, 5.0)
+            started = time.perf_counter()
+            wait_until(lambda: manager.reap(), 5.0)
+            wait_until(lambda: any(ev["state"] == "running" for ev in manager.restart_due()), 5.0)
+            samples.append(time.perf_counter() - started)
+    finally:
+        manager.stop_all()
+        configure(env, devices=1)
+    return {"restart_after_crash": statistics.median(samples)}
+
+
+def _drain(log_queue, predicate, count: int, timeout: float = 30.0):
+    """Reads worker messages until `count` of them satisfy predicate."""
+    deadline = time.monotonic() + timeout
+    while count:
+        msg = log_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+        if predicate(msg):
+            count -= 1
+
+
+def bench_worker(env: str, repeats: int) -> dict:
+    import App
+    from worker import scrcpy_worker_process
+
+    configure(env, devices=WORKER_SESSIONS)
+    # Same start method as the GUI uses for its worker
+    ctx = multiprocessing.get_context("spawn")
+    cmd_queue, log_queue = ctx.Queue(), ctx.Queue()
+    worker = ctx.Process(target=scrcpy_worker_process, args=(cmd_queue, log_queue), daemon=True)
+    # A spawned child re-runs its parent's __main__ module first. Launch it as if
+    # from App.py so worker_ready includes what the GUI's worker actually imports.
+    main_module, sys.modules["__main__"] = sys.modules["__main__"], App
+    try:
+        spawned_at = time.time()
+        worker.start()
+    finally:
+        sys.modules["__main__"] = main_module
+    is_status = lambda m: isinstance(m, dict) and m.get("type") == "sessions"
+    try:
+        ready = None
+        while ready is None:
+            msg = log_queue.get(timeout=30)
+            if isinstance(msg, dict) and msg.get("type") == "ready":
+                ready = msg
+        results = {"worker_ready": ready["ready_at"] - spawned_at}
+        if ready["rss_bytes"]:
+            print(f"  worker RSS at READY: {ready['rss_bytes'] / 1048576:.1f} MB")
+
+        commands = 200
+        started = time.perf_counter()
+        for _ in range(commands):
+            cmd_queue.put({"action": "STATUS"})
+        _drain(log_queue, is_status, commands)
+        results["worker_status_command"] = (time.perf_counter() - started) / commands
+
+        starts, stops = [], []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for i in range(WORKER_SESSIONS):
+                cmd_queue.put({"action": "START", "data": {"serial": f"emulator-{5554 + 2 * i}", "env_path": env}})
+            _drain(log_queue, lambda m: isinstance(m, str) and m.startswith("Worker: Streaming Started!"),
+                   WORKER_SESSIONS)
+            starts.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            cmd_queue.put({"action": "STOP"})
+            _drain(log_queue, lambda m: m == "Worker: Streaming Stopped.", 1)
+            stops.append(time.perf_counter() - started)
+        results[f"worker_start[{WORKER_SESSIONS}]"] = statistics.median(starts)
+        results[f"worker_stop[{WORKER_SESSIONS}]"] = statistics.median(stops)
+        return results
+    finally:
+        cmd_queue.put({"action": "KILL"})
+        worker.join(10)
+        if worker.is_alive():
+            worker.terminate()
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta: float = MIN_DELTA) -> list:
+    regressions = []
+    print(f"\n{'benchmark':<26}{'result':>12}{'baseline':>12}{'change':>10}")
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base:
+            change = (value - base) / base
+            flag = "  REGRESSION" if change > threshold and value - base > min_delta else ""
+            if flag:
+                regressions.append(name)
+            print(f"{name:<26}{value * 1000:>10.2f}ms{base * 1000:>10.2f}ms{change:>+10.0%}{flag}")
+        else:
+            print(f"{name:<26}{value * 1000:>10.2f}ms{'-':>12}{'':>10}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=MIN_DELTA,
+                        help="smallest slowdown in seconds that can count as a regression")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--adb-latency", type=float, default=0.0, help="seconds added to each fake adb call")
+    args = parser.parse_args(argv)
+
+    if args.adb_latency:
+        FAKE_OVERRIDES["adb_latency"] = args.adb_latency
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="guipy-bench-") as env:
+        fakes.install(env)
+        for bench in (bench_list_devices, bench_list_devices_socket, bench_probe_transports, bench_connect_many,
+                      bench_start_stop, bench_restart, bench_worker):
+            print(f"running {bench.__name__}...")
+            results.update(bench(env, args.repeats))
+        stop_all_processes(grace=1.0)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({k: round(v, 6) for k, v in results.items()}, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
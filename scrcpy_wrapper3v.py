@@ -1,107 +1,434 @@
+import asyncio
 import subprocess
 import logging
+import collections
+import io
 import os
+import random
+import re
 import shutil
+import signal
+import socket
+import threading
 import time
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 
+import tracing
+from adb_protocol import AdbProtocolError, AdbSocketClient, iter_device_updates
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 logging.basicConfig(level=logging.INFO, format='| [%(asctime)s] - %(levelname)s | >> %(message)s', datefmt='%H:%M:%S')
 logger = logging.getLogger(__name__)
 
 __version__ = "0.1.2.3"
 
-class ScrcpyClient:
-    def __init__(self, ENV: Optional[str] = None, debug: bool = False):
-        logger.disabled = not debug
-        self.args = []
-        self.process = None
-        base_dir = Path(__file__).parent
+# Executable names differ per platform ("scrcpy.exe" on Windows, "scrcpy" elsewhere).
+EXE_SUFFIX = ".exe" if os.name == "nt" else ""
 
-        local_scrcpy = None
-        local_adb = None
+_resolve_cache: Dict[Optional[str], dict] = {}
+_capabilities_cache: Dict[tuple, dict] = {}
+# (host, port) -> (AdbSocketClient or None, monotonic time of the probe)
+_adb_server_cache: Dict[tuple, tuple] = {}
+# An adb server started or killed meanwhile is noticed after at most this many seconds
+ADB_SERVER_PROBE_TTL = 10.0
+# ro.serialno -> last transport probe of that device (see ScrcpyClient.probe_transports)
+_probe_cache: Dict[str, dict] = {}
+_cache_lock = threading.Lock()
 
-        if ENV:
-            local_env_path = (base_dir / ENV).resolve()
-            local_scrcpy = local_env_path / "scrcpy.exe"
-            local_adb = local_env_path / "adb.exe"
-            self.scrcpy_dir = str(local_env_path)
-        
-        if local_scrcpy and local_scrcpy.exists() and local_adb.exists():
-            logger.info(f"Using LOCAL scrcpy: {local_scrcpy}")
-            logger.info(f"Using LOCAL adb: {local_adb}")
-            self.scrcpy_path = str(local_scrcpy)
-            self.adb_path = str(local_adb)
-            return
 
-        logger.info("Local scrcpy not found in ENV. Trying system PATH...")
+def _mtimes(*paths: str) -> Optional[tuple]:
+    try:
+        return tuple(os.stat(p).st_mtime_ns for p in paths)
+    except OSError:
+        return None
+
 
+def resolve_binaries(ENV: Optional[str] = None) -> dict:
+    """
+    Finds scrcpy/adb in the ENV folder, falling back to the system PATH.
+    Results are cached per ENV and re-resolved when the binaries' mtime changes,
+    or when a PATH resolution is cached and the binaries have since appeared in ENV.
+    :return: {"scrcpy_path", "adb_path", "scrcpy_dir", "source": "LOCAL" | "SYSTEM"}
+    """
+    scrcpy_name, adb_name = f"scrcpy{EXE_SUFFIX}", f"adb{EXE_SUFFIX}"
+    local_scrcpy = None
+    local_adb = None
+
+    if ENV:
+        local_env_path = (Path(__file__).parent / ENV).resolve()
+        local_scrcpy = local_env_path / scrcpy_name
+        local_adb = local_env_path / adb_name
+    has_local = bool(local_scrcpy and local_scrcpy.exists() and local_adb.exists())
+
+    with _cache_lock:
+        cached = _resolve_cache.get(ENV)
+        if (cached and (cached["source"] == "LOCAL" or not has_local)
+                and _mtimes(cached["scrcpy_path"], cached["adb_path"]) == cached["mtimes"]):
+            return cached
+
+    if has_local:
+        binaries = {"scrcpy_path": str(local_scrcpy), "adb_path": str(local_adb),
+                    "scrcpy_dir": str(local_env_path), "source": "LOCAL"}
+    else:
+        logger.info("Local scrcpy not found in ENV. Trying system PATH...")
         system_scrcpy = shutil.which("scrcpy")
         system_adb = shutil.which("adb")
 
-        if system_scrcpy and system_adb:
-            logger.info(f"Using SYSTEM scrcpy: {system_scrcpy}")
-            logger.info(f"Using SYSTEM adb: {system_adb}")
-            self.scrcpy_path = system_scrcpy
-            self.adb_path = system_adb
-            self.scrcpy_dir = str(Path(system_scrcpy).parent)
+        if not (system_scrcpy and system_adb):
+            missing = []
+            if not (local_scrcpy and local_scrcpy.exists()) and not system_scrcpy:
+                missing.append(scrcpy_name)
+            if not (local_adb and local_adb.exists()) and not system_adb:
+                missing.append(adb_name)
+            raise FileNotFoundError(
+                f"Missing required files: {', '.join(missing)}. "
+                "Provide a valid ENV folder or install scrcpy/adb in PATH."
+            )
+        binaries = {"scrcpy_path": system_scrcpy, "adb_path": system_adb,
+                    "scrcpy_dir": str(Path(system_scrcpy).parent), "source": "SYSTEM"}
+
+    binaries["mtimes"] = _mtimes(binaries["scrcpy_path"], binaries["adb_path"])
+    with _cache_lock:
+        _resolve_cache[ENV] = binaries
+    return binaries
+
+
+def _probe_adb_server() -> Optional[AdbSocketClient]:
+    """
+    AdbSocketClient.probe() shared by every client in the process: the answer
+    for the configured host/port (or its absence) is reused for ADB_SERVER_PROBE_TTL seconds.
+    """
+    server = AdbSocketClient()
+    key = (server.host, server.port)
+    with _cache_lock:
+        cached = _adb_server_cache.get(key)
+        if cached and time.monotonic() - cached[1] < ADB_SERVER_PROBE_TTL:
+            return cached[0]
+
+    server = AdbSocketClient.probe(server.host, server.port)
+    with _cache_lock:
+        _adb_server_cache[key] = (server, time.monotonic())
+    return server
+
+
+def probe_capabilities(scrcpy_path: str, adb_path: str) -> dict:
+    """
+    Runs "scrcpy --version", "scrcpy --help" and "adb version" once per binary
+    pair (and mtime), returning {"scrcpy_version", "adb_version", "scrcpy_options"}.
+    scrcpy_options is the set of long options the installed scrcpy accepts.
+    """
+    key = (scrcpy_path, adb_path, _mtimes(scrcpy_path, adb_path))
+    with _cache_lock:
+        if key in _capabilities_cache:
+            return _capabilities_cache[key]
+
+    def first_match(argv: List[str], pattern: str) -> Optional[str]:
+        try:
+            out = tracing.run(argv, capture_output=True, text=True, timeout=10).stdout
+        except Exception:
+            return None
+        match = re.search(pattern, out)
+        return match.group(1) if match else None
+
+    try:
+        help_text = tracing.run([scrcpy_path, "--help"], capture_output=True, text=True, timeout=10).stdout
+    except Exception:
+        help_text = ""
+
+    capabilities = {
+        "scrcpy_version": first_match([scrcpy_path, "--version"], r"scrcpy\s+v?([\w.\-]+)"),
+        "adb_version": first_match([adb_path, "version"], r"version\s+([\d.]+)"),
+        "scrcpy_options": frozenset(re.findall(r"(--[a-z][a-z0-9\-]*)", help_text)),
+    }
+    with _cache_lock:
+        _capabilities_cache[key] = capabilities
+    return capabilities
+
+
+# Each scrcpy is launched in its own process group so it can be interrupted
+# (and finalize recordings) without touching anything else on the machine.
+if os.name == "nt":
+    PROCESS_GROUP_KWARGS = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    PROCESS_GROUP_KWARGS = {"start_new_session": True}
+
+# Seconds a killed process gets to go away before it is reported as stuck
+KILL_WAIT = 1.0
+
+# pid -> Popen (or asyncio Process) of every scrcpy launched by this process that is still running
+_live_processes: Dict[int, subprocess.Popen] = {}
+_live_lock = threading.Lock()
+
+
+def _register_process(process: subprocess.Popen):
+    with _live_lock:
+        _live_processes[process.pid] = process
+
+
+def _unregister_process(process: subprocess.Popen):
+    with _live_lock:
+        _live_processes.pop(process.pid, None)
+
+
+def live_processes() -> List[subprocess.Popen]:
+    """scrcpy processes started by this wrapper that have not been stopped."""
+    with _live_lock:
+        return list(_live_processes.values())
+
+
+def _wait_exit(process: subprocess.Popen, timeout: float) -> bool:
+    """Waits for a Popen or asyncio Process to exit. Returns False on timeout."""
+    if isinstance(process, subprocess.Popen):
+        try:
+            process.wait(timeout=timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+    # asyncio processes are reaped by their event loop; watch for the return code it sets
+    deadline = time.monotonic() + timeout
+    while process.returncode is None:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def _signal_group(process: subprocess.Popen, sig: int):
+    """Signals the process group the wrapper created for `process` (or just the process)."""
+    if os.name != "nt":
+        try:
+            if os.getpgid(process.pid) == process.pid:
+                os.killpg(process.pid, sig)
+                return
+        except ProcessLookupError:
             return
+    process.send_signal(sig)
 
-        missing = []
-        if not (local_scrcpy and local_scrcpy.exists()) and not system_scrcpy:
-            missing.append("scrcpy.exe")
-        if not (local_adb and local_adb.exists()) and not system_adb:
-            missing.append("adb.exe")
 
-        raise FileNotFoundError(
-            f"Missing required files: {', '.join(missing)}. "
-            "Provide a valid ENV folder or install scrcpy/adb in PATH."
-        )
+def terminate_process(process: subprocess.Popen, grace: float = 2.0) -> str:
+    """
+    Interrupts a process (SIGINT / CTRL_BREAK, so scrcpy finalizes recordings),
+    waits up to `grace` seconds, then kills its group.
+    :return: "exited" (already gone), "interrupted" or "killed"
+    """
+    try:
+        if (process.poll() if isinstance(process, subprocess.Popen) else process.returncode) is not None:
+            return "exited"
+        try:
+            _signal_group(process, signal.CTRL_BREAK_EVENT if os.name == "nt" else signal.SIGINT)
+            if _wait_exit(process, grace):
+                return "interrupted"
+        except OSError:
+            pass
+        if os.name == "nt":
+            process.kill()
+        else:
+            _signal_group(process, signal.SIGKILL)
+        if not _wait_exit(process, KILL_WAIT):
+            logger.error(f"Process {process.pid} did not exit after SIGKILL.")
+        return "killed"
+    finally:
+        _unregister_process(process)
+
+
+def stop_processes(processes: List[subprocess.Popen], grace: float = 2.0) -> Dict[int, str]:
+    """
+    Stops many processes in parallel; returns {pid: outcome}. Finishes within
+    roughly grace + 1 s regardless of how many processes are stopped.
+    """
+    if not processes:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(64, len(processes))) as pool:
+        outcomes = pool.map(lambda p: terminate_process(p, grace), processes)
+        return {p.pid: outcome for p, outcome in zip(processes, outcomes)}
+
+
+def stop_all_processes(grace: float = 2.0) -> Dict[int, str]:
+    """Fleet shutdown: stops every scrcpy this wrapper started, in parallel."""
+    return stop_processes(live_processes(), grace)
+
+
+def bitrate_to_bps(bitrate) -> int:
+    """ "8M" -> 8000000, "512K" -> 512000, 4000000 -> 4000000. Returns 0 when it cannot be parsed."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KkMm]?)\s*", str(bitrate or ""))
+    if not match:
+        return 0
+    return int(float(match.group(1)) * {"": 1, "K": 1000, "M": 1000000}[match.group(2).upper()])
+
+
+def get_client(ENV: Optional[str] = None, debug: bool = False, **kwargs) -> "ScrcpyClient":
+    """
+    Client factory: blank ENV means "use PATH", and binary resolution comes
+    from the process-wide cache, so creating clients stays cheap.
+    """
+    env = ENV if ENV and ENV.strip() else None
+    return ScrcpyClient(ENV=env, debug=debug, **kwargs)
+
+
+class StreamMetrics:
+    """
+    Parses scrcpy's console output (with --print-fps) into performance samples
+    and keeps rolling aggregates over the last `window` samples.
+    Time to first frame is read from `timings` (the client's startup timings),
+    which the client fills in when it sees FIRST_FRAME_PATTERN.
+    """
+    FPS_PATTERN = re.compile(r"\b(\d+) fps(?: \(\+(\d+) frames? skipped\))?")
+    # scrcpy creates the texture when the first decoded frame arrives
+    FIRST_FRAME_PATTERN = re.compile(r"Texture: \d+x\d+")
+
+    def __init__(self, window: int = 120, timings: Optional[Dict[str, Optional[float]]] = None):
+        self.samples = collections.deque(maxlen=window)
+        self.skipped_total = 0
+        self.timings = timings if timings is not None else {}
+
+    def feed(self, line: str) -> Optional[dict]:
+        """Consumes one output line. Returns the new sample if the line was an FPS report."""
+        match = self.FPS_PATTERN.search(line)
+        if not match:
+            return None
+        sample = {"time": time.time(), "fps": int(match.group(1)), "skipped": int(match.group(2) or 0)}
+        self.samples.append(sample)
+        self.skipped_total += sample["skipped"]
+        return sample
+
+    @property
+    def time_to_first_frame(self) -> Optional[float]:
+        return self.timings.get("first_frame")
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def summary(self) -> dict:
+        fps = [s["fps"] for s in self.samples]
+        ttff = self.time_to_first_frame
+        return {
+            "samples": len(fps),
+            "fps_last": fps[-1] if fps else None,
+            "fps_p50": self._percentile(fps, 50),
+            "fps_p95": self._percentile(fps, 95),
+            "skipped_window": sum(s["skipped"] for s in self.samples),
+            "skipped_total": self.skipped_total,
+            "time_to_first_frame": round(ttff, 3) if ttff is not None else None,
+        }
+
+
+class ScrcpyClient:
+    # Seconds scrcpy gets to exit after the interrupt before it is killed
+    STOP_GRACE = 2.0
+
+    def __init__(self, ENV: Optional[str] = None, debug: bool = False, use_adb_server: bool = True,
+                 output_lines: int = 500):
+        logger.disabled = not debug
+        self.args = []
+        self.process = None
+        # Last scrcpy output lines (bounded) and an optional per-line callback
+        self.output = collections.deque(maxlen=output_lines)
+        self.on_output: Optional[Callable[[str], None]] = None
+        # Set by set_metrics(); on_metrics receives the summary after each FPS sample
+        self.metrics: Optional[StreamMetrics] = None
+        self.on_metrics: Optional[Callable[[dict], None]] = None
+        # None = not probed yet, False = unavailable (use the adb binary)
+        self._adb_socket = None if use_adb_server else False
+        self.serial: Optional[str] = None
+        # Startup phase durations in seconds: resolve, preflight, spawn, first_frame
+        self.timings: Dict[str, Optional[float]] = {}
+        self._spawned_at = None
+
+        resolve_started = time.perf_counter()
+        self._resolve_binaries(ENV)
+        self.timings["resolve"] = time.perf_counter() - resolve_started
+
+    def _resolve_binaries(self, ENV: Optional[str]):
+        binaries = resolve_binaries(ENV)
+        logger.info(f"Using {binaries['source']} scrcpy: {binaries['scrcpy_path']}")
+        logger.info(f"Using {binaries['source']} adb: {binaries['adb_path']}")
+        self.scrcpy_path = binaries["scrcpy_path"]
+        self.adb_path = binaries["adb_path"]
+        self.scrcpy_dir = binaries["scrcpy_dir"]
+
+    @tracing.traced
+    def capabilities(self) -> dict:
+        """Versions and supported scrcpy options of the resolved binaries (probed once, cached)."""
+        return probe_capabilities(self.scrcpy_path, self.adb_path)
     
-    def list_devices(self) -> List[dict]:
-        """Returns a list of connected devices using the ADB in the scrcpy folder."""
+    # Properties fetched for every device in a single "adb shell" round-trip.
+    DEVICE_PROPS = {
+        "brand": "ro.product.brand",
+        "model": "ro.product.model",
+        "sdk": "ro.build.version.sdk",
+        "abi": "ro.product.cpu.abi",
+    }
+
+    @tracing.traced
+    def list_devices(self, max_workers: int = 8, timeout: float = 5.0) -> List[dict]:
+        """
+        Returns a list of connected devices using the ADB in the scrcpy folder.
+        Device properties are queried concurrently, one shell call per device.
+        :param max_workers: Maximum number of devices queried at the same time
+        :param timeout: Seconds to wait for each device before reporting it as "Unknown"
+        """
         if not os.path.exists(self.adb_path):
             logger.error("ADB not found, cannot list devices.")
             return []
 
         try:
-            result = subprocess.run(
-                [self.adb_path, "devices"], 
-                capture_output=True, text=True, cwd=self.scrcpy_dir
-            )
-            lines = result.stdout.strip().split("\n")[1:]
-            devices_info = []
-
-            for line in lines:
-                parts = line.split("\t")
-                if len(parts) >= 2 and parts[1] == "device":
-                    serial = parts[0]
-                    brand = self._get_adb_prop(serial, "ro.product.brand")
-                    model = self._get_adb_prop(serial, "ro.product.model")
-                    
-                    devices_info.append({
-                        "serial": serial,
-                        "brand": brand,
-                        "model": model
-                    })
-            return devices_info
+            serials = self._list_serials(timeout)
+            if not serials:
+                return []
+
+            workers = max(1, min(max_workers, len(serials)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                props = list(pool.map(
+                    lambda serial: self._get_adb_props(serial, self.DEVICE_PROPS, timeout), serials
+                ))
+
+            return [{"serial": serial, **info} for serial, info in zip(serials, props)]
         except Exception as e:
             logger.error(f"Failed to list devices: {e}")
             return []
 
-    def pair_device(self, device_ip_port: str, pair_code: str) -> bool:
+    @tracing.traced
+    def pair_device(self, device_ip_port: str, pair_code: str, timeout: float = 30.0) -> bool:
         """
         Pairs a device using wireless debugging.
         :param device_ip_port: format "192.168.1.5:45455"
         :param pair_code: The 6-digit pairing code from the device
+        :param timeout: Seconds before the attempt is abandoned
         """
         logger.info(f"Attempting to pair: {device_ip_port} with code {pair_code}")
+        server = self._adb_server()
+        if server:
+            try:
+                output = server.pair(device_ip_port, pair_code, timeout=timeout)
+                if output.lower().startswith("successfully paired"):
+                    logger.info("Device paired successfully!")
+                    return True
+                logger.error(f"Failed to pair device. Output: {output}")
+                return False
+            except ConnectionError as e:
+                logger.warning(f"adb server request failed ({e}), falling back to adb binary.")
+            except (AdbProtocolError, OSError) as e:
+                # A timeout is a failed attempt: retrying it through the binary would double the wait
+                logger.error(f"Failed to pair device. Error: {e}")
+                return False
+
         try:
-            result = subprocess.run(
+            result = tracing.run(
                 [self.adb_path, "pair", device_ip_port, pair_code],
                 cwd=self.scrcpy_dir,
                 capture_output=True,
-                text=True
+                text=True,
+                timeout=timeout
             )
 
             if result.returncode == 0:
@@ -114,17 +441,35 @@ class ScrcpyClient:
             logger.error(f"Exception during pairing: {e}")
             return False
 
-    def connect_device(self, device_ip_port: str) -> bool:
+    @tracing.traced
+    def connect_device(self, device_ip_port: str, timeout: float = 30.0) -> bool:
         """
         Connects to a TCP/IP device (required after pairing).
         :param device_ip_port: format "192.168.1.5:5555" (Note: port might be different than pairing port)
+        :param timeout: Seconds before the attempt is abandoned
         """
+        server = self._adb_server()
+        if server:
+            try:
+                output = server.connect(device_ip_port, timeout=timeout)
+                if "connected to" in output.lower():
+                    logger.info(f"Successfully connected to {device_ip_port}")
+                    return True
+                logger.warning(f"Connection output: {output}")
+                return False
+            except ConnectionError as e:
+                logger.warning(f"adb server request failed ({e}), falling back to adb binary.")
+            except (AdbProtocolError, OSError) as e:
+                logger.warning(f"Connection output: {e}")
+                return False
+
         try:
-            result = subprocess.run(
+            result = tracing.run(
                 [self.adb_path, "connect", device_ip_port],
                 cwd=self.scrcpy_dir,
                 capture_output=True,
-                text=True
+                text=True,
+                timeout=timeout
             )
             if "connected to" in result.stdout.lower():
                 logger.info(f"Successfully connected to {device_ip_port}")
@@ -136,16 +481,229 @@ class ScrcpyClient:
             logger.error(f"Exception during connect: {e}")
             return False
     
+    @tracing.traced
+    def connect_many(self, endpoints: List, max_workers: int = 8, timeout: float = 10.0,
+                     retries: int = 3, backoff: float = 0.5) -> List[dict]:
+        """
+        Pairs (optionally) and connects many Wi-Fi devices concurrently.
+        :param endpoints: "ip:port" strings, or dicts {"endpoint": "ip:port",
+                          "pair_code": "123456", "pair_endpoint": "ip:pairing_port"}
+        :param timeout: Seconds allowed per attempt
+        :param retries: Extra attempts after the first failure, waiting backoff * 2**n between them
+        :return: One result per endpoint, in input order:
+                 {"endpoint", "success", "paired", "attempts", "latency"}
+        """
+        specs = [self._endpoint_spec(e) for e in endpoints]
+        if not specs:
+            return []
+
+        def run(spec: dict) -> dict:
+            return self._with_retries(spec, timeout, retries, backoff)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(specs)))) as pool:
+            return list(pool.map(run, specs))
+
+    @staticmethod
+    def _endpoint_spec(endpoint) -> dict:
+        spec = {"endpoint": endpoint} if isinstance(endpoint, str) else dict(endpoint)
+        spec["endpoint"] = spec["endpoint"].strip()
+        spec.setdefault("pair_code", None)
+        spec["pair_endpoint"] = spec.get("pair_endpoint") or spec["endpoint"]
+        return spec
+
+    def _with_retries(self, spec: dict, timeout: float, retries: int, backoff: float) -> dict:
+        started = time.perf_counter()
+        result = {"endpoint": spec["endpoint"], "success": False, "paired": None, "attempts": 0}
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(backoff * 2 ** (attempt - 1))
+            result["attempts"] = attempt + 1
+            if spec["pair_code"] and not result["paired"]:
+                result["paired"] = self.pair_device(spec["pair_endpoint"], spec["pair_code"], timeout=timeout)
+                if not result["paired"]:
+                    continue
+            if self.connect_device(spec["endpoint"], timeout=timeout):
+                result["success"] = True
+                break
+        result["latency"] = round(time.perf_counter() - started, 3)
+        return result
+
+    @tracing.traced
+    def probe_transports(self, device: str, ttl: float = 600.0, samples: int = 5,
+                         payload_bytes: int = 1 << 20, timeout: float = 10.0) -> Optional[dict]:
+        """
+        Measures each transport (USB, Wi-Fi) a device is reachable through and picks the fastest.
+        Transports are matched by ro.serialno, and results are cached per device for `ttl` seconds.
+        :param device: Any adb serial of the device ("ABC123" or "192.168.1.5:5555")
+        :param samples: "shell echo" round trips averaged (median) for the latency
+        :param payload_bytes: Size of the bulk transfer used for the throughput
+        :return: {"device", "best", "type": "usb" | "tcp", "video": set_video() caps,
+                  "transports": [{"serial", "type", "rtt_ms", "throughput_bps", "error"}],
+                  "probed_at", "cached"} or None if the device cannot be probed
+        """
+        now = time.time()
+        with _cache_lock:
+            for entry in _probe_cache.values():
+                if now - entry["probed_at"] < ttl and (
+                        entry["device"] == device or any(t["serial"] == device for t in entry["transports"])):
+                    return dict(entry, cached=True)
+
+        try:
+            serials = self._list_serials(timeout=timeout)
+            if not serials:
+                logger.error(f"Cannot probe {device}: no device online.")
+                return None
+            with ThreadPoolExecutor(max_workers=min(8, len(serials))) as pool:
+                hw_serials = dict(zip(serials, pool.map(
+                    lambda s: self._get_adb_props(s, {"serialno": "ro.serialno"}, timeout)["serialno"], serials)))
+        except (OSError, subprocess.TimeoutExpired, AdbProtocolError) as e:
+            logger.error(f"Cannot probe {device}: {e}")
+            return None
+        serialno = hw_serials.get(device) or (device if device in hw_serials.values() else None)
+        if not serialno or serialno == "Unknown":
+            logger.error(f"Cannot probe {device}: device is not online or has no ro.serialno.")
+            return None
+
+        transports = [self._measure_transport(s, samples, payload_bytes, timeout)
+                      for s, hw in hw_serials.items() if hw == serialno]
+        usable = [t for t in transports if t["error"] is None]
+        if not usable:
+            logger.error(f"Cannot probe {device}: {'; '.join(t['error'] for t in transports)}")
+            return None
+        best = max(usable, key=lambda t: (t["throughput_bps"], -t["rtt_ms"]))
+        entry = {"device": serialno, "best": best["serial"], "type": best["type"],
+                 "video": self._video_caps(best), "transports": transports, "probed_at": now}
+        with _cache_lock:
+            _probe_cache[serialno] = entry
+        logger.info(f"Fastest transport for {serialno}: {best['type']} ({best['serial']}), "
+                    f"{best['rtt_ms']} ms RTT, {best['throughput_bps'] / 1e6:.1f} Mbit/s")
+        return dict(entry, cached=False)
+
+    def _measure_transport(self, serial: str, samples: int, payload_bytes: int, timeout: float) -> dict:
+        """Round-trip latency ("shell echo") and bulk throughput ("exec-out dd") over one adb serial."""
+        result = {"serial": serial, "type": "tcp" if ":" in serial or serial.startswith("adb-") else "usb",
+                  "rtt_ms": None, "throughput_bps": None, "error": None}
+        try:
+            rtts = []
+            for _ in range(max(1, samples)):
+                started = time.perf_counter()
+                self._shell(serial, "echo", timeout)
+                rtts.append(time.perf_counter() - started)
+            rtt = sorted(rtts)[len(rtts) // 2]
+
+            blocks = max(1, payload_bytes // 65536)
+            started = time.perf_counter()
+            size = len(self._exec_out(serial, f"dd if=/dev/zero bs=65536 count={blocks} 2>/dev/null", timeout))
+            elapsed = max(time.perf_counter() - started - rtt, 1e-3)
+            if size < blocks * 65536 // 2:
+                raise RuntimeError(f"short transfer ({size} bytes)")
+            result.update(rtt_ms=round(rtt * 1000, 2), throughput_bps=round(size * 8 / elapsed))
+        except Exception as e:
+            result["error"] = f"{serial}: {e}"
+        return result
+
+    @staticmethod
+    def _video_caps(transport: dict) -> dict:
+        """set_video() limits for a measured link: half its throughput, fewer pixels and frames on slow links."""
+        mbits = max(2, min(int(transport["throughput_bps"] / 2e6), 16))
+        return {
+            "bitrate": f"{mbits}M",
+            "max_size": 0 if mbits >= 8 else (1600 if mbits >= 4 else 1024),
+            "fps": 60 if mbits >= 4 else 30,
+        }
+
+    def _exec_out(self, serial: str, command: str, timeout: float = 10.0) -> bytes:
+        """Runs a command without a pty and returns its raw output, through the adb server when available."""
+        server = self._adb_server()
+        if server:
+            try:
+                return server.exec_out(serial, command, timeout=timeout)
+            except ConnectionError as e:
+                logger.warning(f"adb server request failed ({e}), falling back to adb binary.")
+
+        res = tracing.run(
+            [self.adb_path, "-s", serial, "exec-out", command],
+            capture_output=True, cwd=self.scrcpy_dir, timeout=timeout
+        )
+        return res.stdout
+
+    def _adb_server(self) -> Optional[AdbSocketClient]:
+        """Returns the adb server protocol client, probing for it on first use."""
+        if self._adb_socket is None:
+            self._adb_socket = _probe_adb_server() or False
+            logger.info(f"ADB backend: {'adb server protocol' if self._adb_socket else 'adb binary'}")
+        return self._adb_socket or None
+
+    def _list_serials(self, timeout: float = 5.0) -> List[str]:
+        """Returns the serials of devices in the "device" (online and authorized) state."""
+        server = self._adb_server()
+        if server:
+            try:
+                return [d["serial"] for d in server.devices(timeout=timeout) if d["state"] == "device"]
+            except (ConnectionError, AdbProtocolError) as e:
+                logger.warning(f"adb server request failed ({e}), falling back to adb binary.")
+
+        result = tracing.run(
+            [self.adb_path, "devices"], 
+            capture_output=True, text=True, cwd=self.scrcpy_dir, timeout=timeout
+        )
+        return self._parse_serials(result.stdout)
+
+    @staticmethod
+    def _parse_serials(devices_output: str) -> List[str]:
+        """Serials in the "device" state from "adb devices" output."""
+        serials = []
+        for line in devices_output.strip().split("\n")[1:]:
+            parts = line.split("\t")
+            if len(parts) >= 2 and parts[1].strip() == "device":
+                serials.append(parts[0])
+        return serials
+
     def _get_adb_prop(self, serial: str, prop: str) -> str:
+        return self._get_adb_props(serial, {prop: prop})[prop]
+
+    def _get_adb_props(self, serial: str, props: Dict[str, str], timeout: float = 5.0) -> Dict[str, str]:
+        """
+        Reads several getprop values with a single "adb shell" call.
+        :param props: Mapping of result key -> Android property name
+        :return: Mapping of result key -> value ("Unknown" when unavailable)
+        """
         try:
-            res = subprocess.run(
-                [self.adb_path, "-s", serial, "shell", "getprop", prop],
-                capture_output=True, text=True, cwd=self.scrcpy_dir
-            )
-            return res.stdout.strip()
-        except Exception:
-            return "Unknown"
+            output = self._shell(serial, self._props_script(props), timeout)
+        except Exception as e:
+            logger.warning(f"Could not read properties of {serial}: {e}")
+            output = ""
+        return self._parse_props(props, output)
 
+    @staticmethod
+    def _props_script(props: Dict[str, str]) -> str:
+        # One echo per property keeps the output aligned even when a value is empty.
+        return "; ".join(f"echo \"$(getprop {name})\"" for name in props.values())
+
+    @staticmethod
+    def _parse_props(props: Dict[str, str], output: str) -> Dict[str, str]:
+        values = output.replace("\r", "").split("\n")
+        return {
+            k: (values[i].strip() if i < len(values) and values[i].strip() else "Unknown")
+            for i, k in enumerate(props)
+        }
+
+    def _shell(self, serial: str, command: str, timeout: float = 5.0) -> str:
+        """Runs a shell command on a device, through the adb server when available."""
+        server = self._adb_server()
+        if server:
+            try:
+                return server.shell(serial, command, timeout=timeout)
+            except ConnectionError as e:
+                logger.warning(f"adb server request failed ({e}), falling back to adb binary.")
+
+        res = tracing.run(
+            [self.adb_path, "-s", serial, "shell", command],
+            capture_output=True, text=True, cwd=self.scrcpy_dir, timeout=timeout
+        )
+        return res.stdout
+
+    @tracing.traced
     def set_video(self, max_size: int = 0, fps: int = 0, bitrate: str = None, 
                   codec: str = "h265", buffer: int = 0, codec_options: str = None, 
                   no_video: bool = False):
@@ -169,6 +727,7 @@ class ScrcpyClient:
         if buffer: self.args.append(f"--video-buffer={buffer}")
         if codec_options: self.args.append(f"--video-codec-options={codec_options}")
 
+    @tracing.traced
     def set_audio(self, bitrate: str = None, source: str = None, codec: str = "aac", 
                   audio_dup: bool = False, no_audio: bool = False):
         if no_audio:
@@ -182,6 +741,7 @@ class ScrcpyClient:
         if bitrate: self.args.append(f"--audio-bit-rate={bitrate}")
         if audio_dup: self.args.append("--audio-dup")
 
+    @tracing.traced
     def set_application(self, title: str = None, fullscreen: bool = False, 
                         always_top: bool = False, borderless: bool = False, 
                         window_x: int = None, window_y: int = None,
@@ -195,12 +755,16 @@ class ScrcpyClient:
         if window_x is not None: self.args.append(f"--window-x={window_x}")
         if window_y is not None: self.args.append(f"--window-y={window_y}")
 
+    @tracing.traced
     def set_connection(self, usb: bool = False, tcp: bool = False, serial: str = None, tcpip: str = None):
         if usb: self.args.append("--select-usb")
         if tcp: self.args.append("--select-tcp")
         if tcpip: self.args.append(f"--tcp-ip={tcpip}")
-        if serial: self.args.append(f"--serial={serial}")
+        if serial:
+            self.args.append(f"--serial={serial}")
+            self.serial = serial
 
+    @tracing.traced
     def set_control(self, no_control: bool = False, stay_awake: bool = False, 
                     turn_screen_off: bool = False, power_off_on_close: bool = False):
         if no_control: self.args.append("--no-control")
@@ -208,6 +772,7 @@ class ScrcpyClient:
         if turn_screen_off: self.args.append("--turn-screen-off")
         if power_off_on_close: self.args.append("--power-off-on-close")
 
+    @tracing.traced
     def set_camera(self, video_source: str = "display", camera_id: int = None, 
                    camera_size: str = None, camera_facing: str = None):
         if video_source.lower() == "camera":
@@ -232,6 +797,7 @@ class ScrcpyClient:
             if camera_id is not None and camera_facing is not None:
                 logger.warning("Both camera-id and camera-facing provided. Scrcpy may prioritize one or fail.")
 
+    @tracing.traced
     def set_controller(self, keyboard: str = None, mouse: str = None, gamepad: str = None):
         valid = ['sdk', 'uhid', 'aoa']
         gamepad_valid = ['aoa', 'uhid', 'disabled']
@@ -239,6 +805,7 @@ class ScrcpyClient:
         if mouse in valid: self.args.append(f"--mouse={mouse}")
         if gamepad in gamepad_valid: self.args.append(f"--gamepad={gamepad}")
 
+    @tracing.traced
     def set_advanced(self, crop: str = None, record_file: str = None, 
                      record_format: str = "mp4", disable_screensaver: bool = False):
         if crop: self.args.append(f"--crop={crop}")
@@ -249,52 +816,1036 @@ class ScrcpyClient:
         if disable_screensaver:
             self.args.append("--disable-screensaver")
 
+    @tracing.traced
+    def set_metrics(self, enabled: bool = True, window: int = 120):
+        """Turns on scrcpy's FPS reporting and parses it into StreamMetrics."""
+        if not enabled:
+            return
+        self.args.append("--print-fps")
+        self.metrics = StreamMetrics(window=window, timings=self.timings)
+
+    @tracing.traced
+    def get_metrics(self) -> Optional[dict]:
+        """Rolling stream metrics (fps p50/p95, skipped frames, time to first frame), or None if disabled."""
+        return self.metrics.summary() if self.metrics else None
+
+    @tracing.traced
     def get_args(self): return self.args
 
-    def start(self):
+    @tracing.traced
+    def start(self, preflight: bool = True):
+        """
+        Launches scrcpy without waiting on adb. The device preflight (a check of the
+        targeted serial, or of any online device) runs concurrently and only logs.
+        :param preflight: Set False to skip the device check entirely
+        """
         full_command = [self.scrcpy_path] + self.args
         
         logger.info(f"Target EXE: {self.scrcpy_path}")
         logger.info(f"Working Dir: {self.scrcpy_dir}")
         logger.info(f"Command: {' '.join(full_command)}")
         
-        devices = self.list_devices()
-        if not devices: 
-            logger.warning("No devices found via 'adb devices'. Scrcpy might fail or wait.")
+        self.timings.update(preflight=None, spawn=None, first_frame=None)
+        if preflight:
+            threading.Thread(target=self._preflight, daemon=True).start()
             
         try:
+            spawn_started = time.perf_counter()
             self.process = subprocess.Popen(
                 full_command, 
                 cwd=self.scrcpy_dir,
-                stdout=None, 
-                stderr=None, 
-                text=True
+                stdout=subprocess.PIPE, 
+                stderr=subprocess.STDOUT, 
+                text=True,
+                errors="replace",
+                **PROCESS_GROUP_KWARGS
             )
+            _register_process(self.process)
+            self._spawned_at = time.perf_counter()
+            self.timings["spawn"] = self._spawned_at - spawn_started
+            threading.Thread(target=self._pump_output, args=(self.process,), daemon=True).start()
             return self.process
         except Exception as e:
             logger.error(f"Failed to start process: {e}")
             raise e
+
+    @tracing.traced
+    def get_timings(self) -> Dict[str, Optional[float]]:
+        """Startup breakdown in seconds; phases not reached (yet) are None."""
+        return dict(self.timings)
+
+    def _preflight(self):
+        started = time.perf_counter()
+        try:
+            if self.serial:
+                state = self._device_state(self.serial)
+                if state != "device":
+                    logger.warning(f"Device {self.serial} is '{state or 'not found'}'. Scrcpy might fail or wait.")
+            elif not self._list_serials():
+                logger.warning("No devices found via 'adb devices'. Scrcpy might fail or wait.")
+        except Exception as e:
+            logger.warning(f"Device preflight failed: {e}")
+        self.timings["preflight"] = time.perf_counter() - started
+
+    def _device_state(self, serial: str, timeout: float = 5.0) -> Optional[str]:
+        """Returns the adb state of one device ("device", "offline", "unauthorized"...) or None if unknown."""
+        server = self._adb_server()
+        if server:
+            try:
+                return server.get_state(serial, timeout=timeout)
+            except ConnectionError as e:
+                logger.warning(f"adb server request failed ({e}), falling back to adb binary.")
+            except (AdbProtocolError, OSError):
+                return None
+
+        res = tracing.run(
+            [self.adb_path, "-s", serial, "get-state"],
+            capture_output=True, text=True, cwd=self.scrcpy_dir, timeout=timeout
+        )
+        return res.stdout.strip() or None
         
+    def _pump_output(self, process: subprocess.Popen):
+        """Drains the child's output so it can never block on a full pipe."""
+        # The span covers the session's lifetime: from spawn until scrcpy closes its output.
+        with tracing.span("subprocess", "scrcpy", [str(a) for a in process.args]) as record:
+            size = 0
+            for line in process.stdout:
+                size += len(line)
+                self._handle_output_line(line)
+            process.stdout.close()
+            returncode = process.wait()
+            # Sessions that end on their own (crash, window closed) leave the registry here
+            _unregister_process(process)
+            if record:
+                record["output_bytes"] = size
+                record["returncode"] = returncode
+
+    def _handle_output_line(self, line: str):
+        line = line.rstrip()
+        if not line:
+            return
+        self.output.append(line)
+        if self.timings.get("first_frame") is None and StreamMetrics.FIRST_FRAME_PATTERN.search(line):
+            self.timings["first_frame"] = time.perf_counter() - self._spawned_at
+        if self.metrics and self.metrics.feed(line) and self.on_metrics:
+            try:
+                self.on_metrics(self.metrics.summary())
+            except Exception as e:
+                logger.error(f"Metrics handler failed: {e}")
+        if self.on_output:
+            try:
+                self.on_output(line)
+            except Exception as e:
+                logger.error(f"Output handler failed: {e}")
+
+    @tracing.traced
+    def stop(self, grace: float = STOP_GRACE):
+        """
+        Interrupts scrcpy (so recordings are finalized), then kills it after `grace` seconds.
+        Only the process started by this client is touched.
+        """
+        if not self.process:
+            logger.warning("No process handle, nothing to stop.")
+            return
+        logger.info("Stopping local process...")
+        outcome = terminate_process(self.process, grace)
+        if outcome == "killed":
+            logger.warning("Local process force killed.")
+        else:
+            logger.info("Local process stopped.")
+
+class AsyncScrcpyClient(ScrcpyClient):
+    """
+    asyncio flavour of ScrcpyClient. Configure it with the same set_* builders,
+    then await the ADB and lifecycle calls. Every adb call has a timeout, and
+    cancelling an awaiting task kills the adb child it was waiting on.
+    """
+
+    def __init__(self, ENV: Optional[str] = None, debug: bool = False, output_lines: int = 500):
+        super().__init__(ENV=ENV, debug=debug, use_adb_server=False, output_lines=output_lines)
+        self._output_task = None
+
+    async def _adb(self, *args: str, timeout: float = 5.0) -> Tuple[int, str, str]:
+        """Runs adb with args. Returns (returncode, stdout, stderr)."""
+        argv = [self.adb_path, *args]
+        with tracing.span("subprocess", tracing.command_name(argv), argv) as record:
+            proc = await asyncio.create_subprocess_exec(
+                *argv, cwd=self.scrcpy_dir,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                out, err = await asyncio.wait_for(proc.communicate(), timeout)
+            except BaseException:
+                # Timeout or cancellation: never leave the adb child behind.
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                raise
+            record["returncode"] = proc.returncode
+            record["output_bytes"] = len(out) + len(err)
+        return proc.returncode, out.decode(errors="replace"), err.decode(errors="replace")
+
+    @tracing.traced
+    async def list_devices(self, max_concurrency: int = 32, timeout: float = 5.0) -> List[dict]:
+        """Awaitable list_devices(); device properties are read concurrently."""
+        try:
+            _, out, _ = await self._adb("devices", timeout=timeout)
+        except Exception as e:
+            logger.error(f"Failed to list devices: {e}")
+            return []
+
+        limit = asyncio.Semaphore(max_concurrency)
+
+        async def describe(serial: str) -> dict:
+            async with limit:
+                try:
+                    _, props_out, _ = await self._adb(
+                        "-s", serial, "shell", self._props_script(self.DEVICE_PROPS), timeout=timeout
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"Could not read properties of {serial}: timed out")
+                    props_out = ""
+                except Exception as e:
+                    # Same as the sync _get_adb_props: one bad device must not fail the whole listing
+                    logger.warning(f"Could not read properties of {serial}: {e}")
+                    props_out = ""
+                return {"serial": serial, **self._parse_props(self.DEVICE_PROPS, props_out)}
+
+        return list(await asyncio.gather(*(describe(serial) for serial in self._parse_serials(out))))
+
+    @tracing.traced
+    async def pair_device(self, device_ip_port: str, pair_code: str, timeout: float = 30.0) -> bool:
+        logger.info(f"Attempting to pair: {device_ip_port} with code {pair_code}")
+        try:
+            code, out, err = await self._adb("pair", device_ip_port, pair_code, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Pairing {device_ip_port} timed out after {timeout}s")
+            return False
+        if code == 0:
+            logger.info("Device paired successfully!")
+            return True
+        logger.error(f"Failed to pair device. Output: {out} | Error: {err}")
+        return False
+
+    @tracing.traced
+    async def connect_device(self, device_ip_port: str, timeout: float = 30.0) -> bool:
+        try:
+            _, out, _ = await self._adb("connect", device_ip_port, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Connecting to {device_ip_port} timed out after {timeout}s")
+            return False
+        if "connected to" in out.lower():
+            logger.info(f"Successfully connected to {device_ip_port}")
+            return True
+        logger.warning(f"Connection output: {out.strip()}")
+        return False
+
+    @tracing.traced
+    async def connect_many(self, endpoints: List, max_concurrency: int = 32, timeout: float = 10.0,
+                           retries: int = 3, backoff: float = 0.5) -> List[dict]:
+        """Awaitable connect_many(); same endpoints and results as ScrcpyClient.connect_many."""
+        limit = asyncio.Semaphore(max_concurrency)
+
+        async def run(spec: dict) -> dict:
+            started = time.perf_counter()
+            result = {"endpoint": spec["endpoint"], "success": False, "paired": None, "attempts": 0}
+            async with limit:
+                for attempt in range(retries + 1):
+                    if attempt:
+                        await asyncio.sleep(backoff * 2 ** (attempt - 1))
+                    result["attempts"] = attempt + 1
+                    if spec["pair_code"] and not result["paired"]:
+                        result["paired"] = await self.pair_device(spec["pair_endpoint"], spec["pair_code"], timeout)
+                        if not result["paired"]:
+                            continue
+                    if await self.connect_device(spec["endpoint"], timeout):
+                        result["success"] = True
+                        break
+            result["latency"] = round(time.perf_counter() - started, 3)
+            return result
+
+        return list(await asyncio.gather(*(run(self._endpoint_spec(e)) for e in endpoints)))
+
+    @tracing.traced
+    async def start(self) -> asyncio.subprocess.Process:
+        full_command = [self.scrcpy_path] + self.args
+        logger.info(f"Command: {' '.join(full_command)}")
+
+        self.timings.update(preflight=None, spawn=None, first_frame=None)
+        spawn_started = time.perf_counter()
+        self.process = await asyncio.create_subprocess_exec(
+            *full_command, cwd=self.scrcpy_dir,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            **PROCESS_GROUP_KWARGS
+        )
+        _register_process(self.process)
+        self._spawned_at = time.perf_counter()
+        self.timings["spawn"] = self._spawned_at - spawn_started
+        self._output_task = asyncio.ensure_future(self._read_output(self.process))
+        return self.process
+
+    async def _read_output(self, process: asyncio.subprocess.Process):
+        with tracing.span("subprocess", "scrcpy", [self.scrcpy_path] + self.args) as record:
+            size = 0
+            async for line in process.stdout:
+                size += len(line)
+                self._handle_output_line(line.decode(errors="replace"))
+            await process.wait()
+            _unregister_process(process)
+            if record:
+                record["output_bytes"] = size
+                record["returncode"] = process.returncode
+
+    @tracing.traced
+    async def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+        """Waits for scrcpy to exit. Returns its exit code (raises asyncio.TimeoutError on timeout)."""
+        if not self.process:
+            return None
+        return await asyncio.wait_for(self.process.wait(), timeout)
+
+    @tracing.traced
+    async def stop(self, grace: float = ScrcpyClient.STOP_GRACE):
+        if not self.process or self.process.returncode is not None:
+            return
+        logger.info("Stopping local process...")
+        try:
+            _signal_group(self.process, signal.CTRL_BREAK_EVENT if os.name == "nt" else signal.SIGINT)
+            await asyncio.wait_for(self.process.wait(), grace)
+            logger.info("Local process stopped.")
+        except (asyncio.TimeoutError, OSError):
+            if os.name == "nt":
+                self.process.kill()
+            else:
+                _signal_group(self.process, signal.SIGKILL)
+            await self.process.wait()
+            logger.warning("Local process force killed.")
+        _unregister_process(self.process)
+        if self._output_task:
+            # Grandchildren may still hold the pipe open; don't wait on them.
+            try:
+                await asyncio.wait_for(self._output_task, 1.0)
+            except asyncio.TimeoutError:
+                pass
+
+
+class DeviceTracker:
+    """
+    Keeps an in-memory device table up to date from adb's track-devices stream.
+    Uses the adb server socket when available, "adb track-devices" otherwise.
+    Device properties are fetched once per serial and cached until it disconnects.
+
+    on_event receives {"event": "added" | "removed" | "changed", "device": {...}}.
+    """
+
+    def __init__(self, client: ScrcpyClient, on_event: Optional[Callable[[dict], None]] = None,
+                 reconnect_delay: float = 1.0, prop_workers: int = 4):
+        self.client = client
+        self.on_event = on_event
+        self.reconnect_delay = reconnect_delay
+        self._devices: Dict[str, dict] = {}
+        self._props: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._close_stream = None
+        self._prop_workers = prop_workers
+        self._pool = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self._prop_workers)
+        self._thread = threading.Thread(target=self._run, name="DeviceTracker", daemon=True)
+        self._thread.start()
+
     def stop(self):
-        if self.process:
-            logger.info("Stopping local process...")
-            self.process.terminate()
+        self._stop_event.set()
+        if self._close_stream:
             try:
-                self.process.wait(timeout=2)
-                logger.info("Local process stopped.")
+                self._close_stream()
+            except OSError:
+                pass
+        if self._thread:
+            self._thread.join(timeout=2)
+        if self._pool:
+            self._pool.shutdown(wait=False)
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def devices(self) -> List[dict]:
+        """Returns every tracked device (any state) with its cached properties."""
+        with self._lock:
+            return [self._record(serial) for serial in self._devices]
+
+    def list_devices(self) -> List[dict]:
+        """Same shape as ScrcpyClient.list_devices(), served from memory."""
+        return [d for d in self.devices() if d["state"] == "device"]
+
+    def _record(self, serial: str) -> dict:
+        props = self._props.get(serial) or {k: "Unknown" for k in ScrcpyClient.DEVICE_PROPS}
+        return {**self._devices[serial], **props}
+
+    def _emit(self, event: str, device: dict):
+        if not self.on_event:
+            return
+        try:
+            self.on_event({"event": event, "device": device})
+        except Exception as e:
+            logger.error(f"Device event handler failed: {e}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                for update in self._stream():
+                    self._apply(update)
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    logger.warning(f"Device tracking interrupted: {e}")
+            self._stop_event.wait(self.reconnect_delay)
+
+    def _stream(self):
+        server = self.client._adb_server()
+        if server:
+            sock = server.track_devices()
+            self._close_stream = lambda: sock.shutdown(socket.SHUT_RDWR)
+            with sock:
+                yield from iter_device_updates(sock.recv)
+            return
+
+        proc = subprocess.Popen(
+            [self.client.adb_path, "track-devices", "-l"],
+            cwd=self.client.scrcpy_dir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self._close_stream = proc.kill
+        try:
+            yield from iter_device_updates(proc.stdout.read1)
+        finally:
+            proc.kill()
+            proc.wait()
+
+    def _apply(self, update: List[dict]):
+        current = {d["serial"]: d for d in update}
+        events = []
+        with self._lock:
+            for serial in list(self._devices):
+                if serial not in current:
+                    events.append(("removed", self._record(serial)))
+                    del self._devices[serial]
+                    self._props.pop(serial, None)
+
+            for serial, info in current.items():
+                previous = self._devices.get(serial)
+                self._devices[serial] = info
+                if previous is None:
+                    events.append(("added", self._record(serial)))
+                elif previous["state"] != info["state"]:
+                    events.append(("changed", self._record(serial)))
+                if info["state"] == "device" and serial not in self._props:
+                    self._props[serial] = None
+                    self._pool.submit(self._fetch_props, serial)
+
+        for event, device in events:
+            self._emit(event, device)
+
+    def _fetch_props(self, serial: str):
+        props = self.client._get_adb_props(serial, ScrcpyClient.DEVICE_PROPS)
+        with self._lock:
+            if serial not in self._devices:
                 return
-            except subprocess.TimeoutExpired:
-                self.process.kill()
-                logger.warning("Local process force killed.")
+            self._props[serial] = props
+            record = self._record(serial)
+        self._emit("changed", record)
+
+
+class ThumbnailService:
+    """
+    Low-resolution device screenshots ("adb exec-out screencap -p") for device pickers,
+    without a scrcpy session. Thumbnails are kept in a size-bounded LRU cache keyed by
+    serial, reused for `ttl` seconds, and a device is captured at most once per
+    `min_interval` seconds. Downscaled to JPEG when Pillow is installed; otherwise the
+    PNG is passed through (let the GUI scale it).
+    """
+
+    def __init__(self, client: ScrcpyClient, max_width: int = 240, ttl: float = 10.0,
+                 min_interval: float = 5.0, max_bytes: int = 8 * 1024 * 1024, timeout: float = 10.0):
+        self.client = client
+        self.max_width = max_width
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._cache: "collections.OrderedDict[str, dict]" = collections.OrderedDict()
+        self._cache_bytes = 0
+        self._last_capture: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "captures": 0, "throttled": 0, "failures": 0, "evictions": 0}
+
+    def get(self, serial: str, force: bool = False) -> Optional[dict]:
+        """
+        Returns {"serial", "mime", "data": bytes, "width", "height", "captured_at", "cached"},
+        capturing a new screenshot when the cached one is older than ttl (or force is set)
+        and the device was not captured in the last min_interval seconds.
+        The stale thumbnail (or None) is returned while a device is throttled or fails.
+        """
+        with self._lock:
+            device_lock = self._locks.setdefault(serial, threading.Lock())
+        # One capture per device at a time; concurrent callers wait and get its result.
+        with device_lock:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._cache.get(serial)
+                if entry:
+                    self._cache.move_to_end(serial)
+                if entry and not force and now - entry["monotonic"] < self.ttl:
+                    self.counters["hits"] += 1
+                    return self._public(entry, cached=True)
+                if now - self._last_capture.get(serial, float("-inf")) < self.min_interval:
+                    self.counters["throttled"] += 1
+                    return self._public(entry, cached=True) if entry else None
+                self._last_capture[serial] = now
+
+            try:
+                entry = self._capture(serial)
+            except Exception as e:
+                logger.warning(f"Thumbnail capture failed for {serial}: {e}")
+                with self._lock:
+                    self.counters["failures"] += 1
+                    entry = self._cache.get(serial)
+                return self._public(entry, cached=True) if entry else None
+
+            with self._lock:
+                self.counters["captures"] += 1
+                self._store(serial, entry)
+            return self._public(entry, cached=False)
+
+    def invalidate(self, serial: Optional[str] = None):
+        """Drops one device's thumbnail (e.g. on unplug), or all of them."""
+        with self._lock:
+            for key in ([serial] if serial else list(self._cache)):
+                entry = self._cache.pop(key, None)
+                if entry:
+                    self._cache_bytes -= len(entry["data"])
+                self._last_capture.pop(key, None)
+                self._locks.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, entries=len(self._cache), bytes=self._cache_bytes)
+
+    def _capture(self, serial: str) -> dict:
+        png = self.client._exec_out(serial, "screencap -p", self.timeout)
+        if not png.startswith(b"\x89PNG"):
+            raise RuntimeError("screencap did not return a PNG")
+        # Imported here so processes that never take thumbnails (the session worker) don't load Pillow
+        try:
+            from PIL import Image
+        except ImportError:
+            Image = None
+        if Image is None:
+            # IHDR: width and height are the first two big-endian ints after the chunk header
+            width, height = int.from_bytes(png[16:20], "big"), int.from_bytes(png[20:24], "big")
+            return {"serial": serial, "mime": "image/png", "data": png, "width": width, "height": height,
+                    "captured_at": time.time(), "monotonic": time.monotonic()}
+
+        with Image.open(io.BytesIO(png)) as image:
+            image = image.convert("RGB")
+            image.thumbnail((self.max_width, self.max_width * 4))
+            out = io.BytesIO()
+            image.save(out, format="JPEG", quality=70)
+            return {"serial": serial, "mime": "image/jpeg", "data": out.getvalue(), "width": image.width, "height": image.height,
+                    "captured_at": time.time(), "monotonic": time.monotonic()}
+
+    def _store(self, serial: str, entry: dict):
+        old = self._cache.pop(serial, None)
+        if old:
+            self._cache_bytes -= len(old["data"])
+        self._cache[serial] = entry
+        self._cache_bytes += len(entry["data"])
+        while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted["data"])
+            self.counters["evictions"] += 1
+
+    @staticmethod
+    def _public(entry: dict, cached: bool) -> dict:
+        return dict({k: v for k, v in entry.items() if k != "monotonic"}, cached=cached)
+
+
+class HeadlessRecorder:
+    """
+    Records a device without a window or control channel, rotating into a new
+    segment file when `segment_seconds` or `segment_bytes` is reached and deleting
+    its oldest segments to stay under `quota_bytes`.
+
+    Wraps a configured ScrcpyClient and can be handed to ScrcpySessionManager in
+    its place: start()/stop()/poll()/pid mirror the client and its process.
+    """
+    CHECK_INTERVAL = 0.5
+    # Finalizing a recording takes longer than closing a window
+    STOP_GRACE = 5.0
+
+    def __init__(self, client: ScrcpyClient, directory: str, record_format: str = "mkv",
+                 segment_seconds: Optional[float] = None, segment_bytes: Optional[int] = None,
+                 quota_bytes: Optional[int] = None, prefix: Optional[str] = None):
+        self.client = client
+        self.directory = Path(directory)
+        # mkv stays playable even if a segment is cut short; mp4 needs a clean finish
+        self.record_format = record_format if record_format in ("mkv", "mp4") else "mkv"
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.quota_bytes = quota_bytes
+        self.prefix = prefix or re.sub(r"[^\w.-]", "_", client.serial or "device")
+        self.segments: List[Path] = []
+        self.deleted_segments = 0
+        self.returncode = None
+        self._bytes_done = 0
+        self._recording_seconds = 0.0
+        self._segment_started = None
+        self._current: Optional[subprocess.Popen] = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._stop_grace = self.STOP_GRACE
+
+    # --- Session manager interface ---
+
+    @property
+    def serial(self) -> Optional[str]:
+        return self.client.serial
+
+    @property
+    def process(self) -> "HeadlessRecorder":
+        return self
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._current.pid if self._current else None
+
+    def poll(self) -> Optional[int]:
+        """None while recording; the scrcpy exit code once recording stopped on its own."""
+        return None if self._thread and self._thread.is_alive() else self.returncode
+
+    def _device_state(self, serial: str) -> Optional[str]:
+        return self.client._device_state(serial)
+
+    def start(self, preflight: bool = True) -> "HeadlessRecorder":
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.returncode = None
+        self._stop_grace = self.STOP_GRACE
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(preflight,), name="HeadlessRecorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, grace: float = STOP_GRACE):
+        self._stop_grace = grace
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=grace + KILL_WAIT)
+
+    # --- Recording loop ---
+
+    def _headless_args(self) -> List[str]:
+        options = self.client.capabilities()["scrcpy_options"]
+        if not options or "--no-window" in options:
+            flags = ["--no-window"]
+            # --no-window only skips video playback; audio would still be decoded and played on the host
+            if "--no-audio-playback" in options: flags.append("--no-audio-playback")
+            elif "--no-playback" in options: flags.append("--no-playback")
+        elif "--no-playback" in options:
+            flags = ["--no-playback"]
+        else:
+            flags = ["--no-display"]
+        # scrcpy refuses the device-control and input options (set_controller) together with
+        # --no-control; --disable-screensaver only matters while a window is shown
+        base = [a for a in self.client.args
+                if not a.startswith(("--record", "--no-window", "--no-playback", "--no-audio-playback", "--no-display",
+                                     "--no-control", "--window-", "--fullscreen", "--always-on-top",
+                                     "--stay-awake", "--turn-screen-off", "--power-off-on-close",
+                                     "--keyboard", "--mouse", "--gamepad", "--disable-screensaver"))]
+        return base + flags + ["--no-control"]
+
+    def _run(self, preflight: bool):
+        base_args = self._headless_args()
+        while not self._stop_event.is_set():
+            # Leave room for the segment about to be written when its size is bounded
+            self._enforce_quota(reserve=self.segment_bytes or 0)
+            path = self.directory / f"{self.prefix}_{time.strftime('%Y%m%d-%H%M%S')}_{len(self.segments):04d}.{self.record_format}"
+            self.client.args = base_args + [f"--record={path}", f"--record-format={self.record_format}"]
+            try:
+                self._current = self.client.start(preflight=preflight and not self.segments)
+            except Exception as e:
+                logger.error(f"Headless recording could not start: {e}")
+                self.returncode = -1
+                return
+            self.segments.append(path)
+            self._segment_started = time.monotonic()
+            rotated = self._watch_segment(self._current, path)
+
+            self._recording_seconds += time.monotonic() - self._segment_started
+            self._segment_started = None
+            self._bytes_done += self._size(path)
+            if not rotated and not self._stop_event.is_set():
+                self.returncode = self._current.returncode
+                logger.warning(f"Headless recording of {self.prefix} ended unexpectedly (exit code {self.returncode}).")
                 return
+        self.returncode = 0
+
+    def _watch_segment(self, process: subprocess.Popen, path: Path) -> bool:
+        """Waits for the segment to end. Returns True if it was rotated (not crashed or stopped)."""
+        while process.poll() is None:
+            if self._stop_event.wait(self.CHECK_INTERVAL):
+                self._finish(process)
+                return False
+            elapsed = time.monotonic() - self._segment_started
+            # The running segment counts against the quota too. Room is kept for what it will
+            # write before the next check; when it alone would exceed the quota, recording stops.
+            if self.quota_bytes:
+                upcoming = int(self._size(path) / elapsed * self.CHECK_INTERVAL) if elapsed > 0 else 0
+                if self._enforce_quota(reserve=upcoming, current=path) + upcoming > self.quota_bytes:
+                    logger.warning(f"Quota: {path.name} would exceed the {self.quota_bytes} byte quota, stopping the recording.")
+                    self._stop_event.set()
+                    self._finish(process)
+                    return False
+            if ((self.segment_bytes and self._size(path) >= self.segment_bytes)
+                    or (self.segment_seconds and elapsed >= self.segment_seconds)):
+                self._finish(process)
+                return True
+        return False
+
+    def _finish(self, process: subprocess.Popen):
+        """Interrupts scrcpy so it finalizes the file, killing it only if it does not exit."""
+        terminate_process(process, self._stop_grace)
 
-        logger.warning("Process handle not found. Force killing all scrcpy.exe instances.")
+    def _enforce_quota(self, reserve: int = 0, current: Optional[Path] = None) -> int:
+        """
+        Deletes the oldest segments (never `current`, the one being written) until
+        the recorder's files plus `reserve` bytes fit the quota. Returns the bytes left on disk.
+        Only this recorder's segments are counted or deleted, never other files sharing the prefix.
+        """
+        if not self.quota_bytes:
+            return 0
+        budget = self.quota_bytes - reserve
+        # self.segments is in recording order, oldest first
+        existing = [p for p in self.segments if p.exists()]
+        total = sum(self._size(p) for p in existing)
+        existing = [p for p in existing if p != current]
+        while existing and total > budget:
+            oldest = existing.pop(0)
+            size = self._size(oldest)
+            try:
+                oldest.unlink()
+                total -= size
+                self.deleted_segments += 1
+                logger.info(f"Quota: deleted old segment {oldest.name}")
+            except OSError as e:
+                logger.warning(f"Quota: could not delete {oldest}: {e}")
+        return total
+
+    @staticmethod
+    def _size(path: Path) -> int:
         try:
-            subprocess.run(["taskkill", "/F", "/IM", "scrcpy.exe"], 
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        except Exception as e:
-            logger.error(f"Failed to stop process: {e}")
-            raise e
+            return path.stat().st_size
+        except OSError:
+            return 0
+
+    def stats(self) -> dict:
+        """Segments written, total bytes and average write throughput (bytes/s) while recording."""
+        current_bytes = self._size(self.segments[-1]) if self._segment_started is not None else 0
+        seconds = self._recording_seconds
+        if self._segment_started is not None:
+            seconds += time.monotonic() - self._segment_started
+        written = self._bytes_done + current_bytes
+        return {
+            "segments": len(self.segments),
+            "current_file": str(self.segments[-1]) if self.segments else None,
+            "bytes_written": written,
+            "throughput_bps": round(written / seconds) if seconds > 0 else 0,
+            "deleted_segments": self.deleted_segments,
+        }
+
+
+def process_usage(pid: int) -> Optional[Dict[str, float]]:
+    """
+    Returns {"cpu_seconds", "rss_bytes"} for a process, or None if unavailable.
+    Uses psutil when installed, /proc on Linux otherwise.
+    """
+    try:
+        if psutil:
+            proc = psutil.Process(pid)
+            cpu = proc.cpu_times()
+            return {"cpu_seconds": cpu.user + cpu.system, "rss_bytes": proc.memory_info().rss}
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the ")" closing the command name; utime/stime are fields 14/15.
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            rss_pages = int(f.read().split()[1])
+        ticks = os.sysconf("SC_CLK_TCK")
+        return {
+            "cpu_seconds": (int(fields[11]) + int(fields[12])) / ticks,
+            "rss_bytes": rss_pages * os.sysconf("SC_PAGE_SIZE"),
+        }
+    except Exception:
+        return None
+
+
+def process_sentinel(process: subprocess.Popen):
+    """
+    Returns an object that multiprocessing.connection.wait() reports ready when
+    the process exits: the process handle on Windows, a pidfd on Linux.
+    Returns None when the platform offers neither, or for non-Popen handles
+    such as HeadlessRecorder (those are polled instead).
+    """
+    if not isinstance(process, subprocess.Popen):
+        return None
+    if os.name == "nt":
+        return int(process._handle)
+    if hasattr(os, "pidfd_open"):
+        try:
+            return os.pidfd_open(process.pid)
+        except OSError:
+            return None
+    return None
+
+
+class RestartPolicy:
+    """
+    How a supervised session is relaunched after an unexpected exit: exponential
+    backoff with jitter, and a circuit breaker that gives up after `max_restarts`
+    crashes within `window` seconds.
+    """
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 60.0, jitter: float = 0.2,
+                 max_restarts: int = 5, window: float = 300.0, device_wait: bool = True,
+                 device_poll: float = 2.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_restarts = max_restarts
+        self.window = window
+        # Before relaunching, wait (polling every device_poll s) until the serial is back online
+        self.device_wait = device_wait
+        self.device_poll = device_poll
+
+    def delay(self, crashes: int) -> float:
+        """Backoff before the restart that follows the n-th recent crash (n >= 1)."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (crashes - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class ScrcpySessionManager:
+    """
+    Runs and supervises many concurrent scrcpy sessions, keyed by serial
+    (or any caller-chosen key), with a cap on how many may run at once.
+    Sessions started with a RestartPolicy are relaunched when they crash.
+    """
+    # Longest stop_all() takes with default graces: sessions are interrupted in parallel,
+    # each gets its grace, then is killed.
+    STOP_TIMEOUT = max(ScrcpyClient.STOP_GRACE, HeadlessRecorder.STOP_GRACE) + KILL_WAIT
+
+    def __init__(self, max_sessions: int = 16):
+        self.max_sessions = max_sessions
+        self.sessions: Dict[str, dict] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.sessions
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def start(self, key: str, client: ScrcpyClient,
+              restart_policy: Optional[RestartPolicy] = None) -> subprocess.Popen:
+        """Starts a configured client as session `key`, replacing a running session with the same key."""
+        if key in self.sessions:
+            self.stop(key)
+        if len(self.sessions) >= self.max_sessions:
+            raise RuntimeError(f"Session limit reached ({self.max_sessions}), cannot start {key}.")
+
+        process = client.start()
+        self.sessions[key] = {
+            "client": client,
+            "sentinel": process_sentinel(process),
+            "started_at": time.time(),
+            "cpu_sample": (time.monotonic(), 0.0),
+            "state": "running",
+            "policy": restart_policy,
+            "restarts": 0,
+            "crashes": collections.deque(),
+            "next_restart": None,
+            "down_since": None,
+            "downtime": 0.0,
+        }
+        logger.info(f"Session {key} started (pid {process.pid}). Active sessions: {len(self.sessions)}")
+        return process
+
+    def stop(self, key: str) -> bool:
+        session = self.sessions.pop(key, None)
+        if not session:
+            return False
+        if session["state"] == "running":
+            session["client"].stop()
+        self._close_sentinel(session)
+        return True
+
+    def stop_all(self) -> List[str]:
+        """Stops every session in parallel, so shutdown takes one grace period instead of N."""
+        keys = list(self.sessions)
+        if keys:
+            with ThreadPoolExecutor(max_workers=min(64, len(keys))) as pool:
+                list(pool.map(self.stop, keys))
+        return keys
+
+    def reap(self) -> List[dict]:
+        """
+        Handles sessions whose process has exited. Clean exits (code 0, e.g. the window
+        was closed) and unsupervised sessions are removed; supervised sessions that
+        crashed are scheduled for a restart, or removed once the circuit opens.
+        :return: [{"key", "returncode", "state": "ended" | "restarting" | "failed", "retry_in"}, ...]
+        """
+        events = []
+        for key, session in list(self.sessions.items()):
+            if session["state"] != "running":
+                continue
+            code = session["client"].process.poll()
+            if code is None:
+                continue
+            self._close_sentinel(session)
+            event = {"key": key, "returncode": code, "state": "ended", "retry_in": None}
+            if session["policy"] and code != 0:
+                session["down_since"] = time.monotonic()
+                event.update(self._schedule_restart(key, session))
+            else:
+                del self.sessions[key]
+            events.append(event)
+        return events
+
+    def _schedule_restart(self, key: str, session: dict) -> dict:
+        policy = session["policy"]
+        now = time.monotonic()
+        crashes = session["crashes"]
+        crashes.append(now)
+        while crashes and now - crashes[0] > policy.window:
+            crashes.popleft()
+
+        if len(crashes) > policy.max_restarts:
+            logger.error(f"Session {key} crashed {len(crashes)} times in {policy.window:.0f}s, giving up.")
+            del self.sessions[key]
+            return {"state": "failed"}
+
+        delay = policy.delay(len(crashes))
+        session["state"] = "restarting"
+        session["next_restart"] = now + delay
+        return {"state": "restarting", "retry_in": round(delay, 2)}
+
+    def restart_due(self) -> List[dict]:
+        """
+        Relaunches supervised sessions whose backoff has elapsed and whose device is online.
+        :return: [{"key", "state": "running" | "waiting_device" | "restarting" | "failed", "restarts", "downtime"}, ...]
+        """
+        events = []
+        now = time.monotonic()
+        for key, session in list(self.sessions.items()):
+            if session["state"] != "restarting" or session["next_restart"] > now:
+                continue
+            client, policy = session["client"], session["policy"]
+
+            if policy.device_wait and client.serial:
+                try:
+                    state = client._device_state(client.serial)
+                except (subprocess.TimeoutExpired, OSError) as e:
+                    # A hung or missing adb must not stall the other sessions: count it as offline
+                    logger.warning(f"Cannot query device {client.serial} for session {key}: {e}")
+                    state = None
+                if state != "device":
+                    session["next_restart"] = now + policy.device_poll
+                    if not session.get("waiting_device"):
+                        # Reported once per outage, not on every poll
+                        session["waiting_device"] = True
+                        events.append({"key": key, "state": "waiting_device", "restarts": session["restarts"],
+                                       "downtime": round(now - session["down_since"], 1)})
+                    continue
+
+            try:
+                process = client.start(preflight=False)
+            except Exception as e:
+                logger.error(f"Restart of session {key} failed: {e}")
+                result = self._schedule_restart(key, session)
+                events.append({"key": key, "state": result["state"], "restarts": session["restarts"],
+                               "downtime": round(now - session["down_since"], 1)})
+                continue
+
+            down = time.monotonic() - session["down_since"]
+            session.update(state="running", sentinel=process_sentinel(process), next_restart=None,
+                           down_since=None, waiting_device=False, started_at=time.time(), cpu_sample=(time.monotonic(), 0.0))
+            session["restarts"] += 1
+            session["downtime"] += down
+            logger.info(f"Session {key} restarted (pid {process.pid}) after {down:.1f}s down.")
+            events.append({"key": key, "state": "running", "restarts": session["restarts"],
+                           "downtime": round(down, 1)})
+        return events
+
+    def next_restart_in(self) -> Optional[float]:
+        """Seconds until the earliest pending restart, or None if nothing is pending."""
+        pending = [s["next_restart"] for s in self.sessions.values() if s["state"] == "restarting"]
+        if not pending:
+            return None
+        return max(0.0, min(pending) - time.monotonic())
+
+    def sentinels(self) -> list:
+        """Waitables for multiprocessing.connection.wait(), one per session that has one."""
+        return [s["sentinel"] for s in self.sessions.values() if s["sentinel"] is not None]
+
+    def needs_polling(self) -> bool:
+        """True when some running session has no sentinel and must be checked with reap() periodically."""
+        return any(s["state"] == "running" and s["sentinel"] is None for s in self.sessions.values())
+
+    @staticmethod
+    def _close_sentinel(session: dict):
+        # pidfds are ours to close; Windows handles belong to the Popen object.
+        if os.name != "nt" and session["sentinel"] is not None:
+            os.close(session["sentinel"])
+        session["sentinel"] = None
+
+    def status(self, key: Optional[str] = None) -> List[dict]:
+        """Per-session state with restart counts, downtime, time to first frame, CPU (% since the previous call) and memory."""
+        keys = [key] if key else list(self.sessions)
+        report = []
+        for k in keys:
+            session = self.sessions.get(k)
+            if not session:
+                continue
+            process = session["client"].process
+            downtime = session["downtime"]
+            if session["down_since"] is not None:
+                downtime += time.monotonic() - session["down_since"]
+            entry = {
+                "key": k,
+                "pid": process.pid,
+                "state": session["state"],
+                "running": process.poll() is None,
+                "uptime": round(time.time() - session["started_at"], 1),
+                "restarts": session["restarts"],
+                "downtime": round(downtime, 1),
+                "first_frame": getattr(session["client"], "timings", {}).get("first_frame"),
+                "cpu_percent": None,
+                "cpu_seconds": None,
+                "rss_bytes": None,
+            }
+            if isinstance(session["client"], HeadlessRecorder):
+                entry["recording"] = session["client"].stats()
+            usage = process_usage(process.pid) if entry["running"] and process.pid else None
+            if usage:
+                now = time.monotonic()
+                last_time, last_cpu = session["cpu_sample"]
+                if now > last_time:
+                    entry["cpu_percent"] = round(100 * (usage["cpu_seconds"] - last_cpu) / (now - last_time), 1)
+                session["cpu_sample"] = (now, usage["cpu_seconds"])
+                entry.update(usage)
+            report.append(entry)
+        return report
+
 
 if __name__ == "__main__":
     # Example Usage
@@ -0,0 +1,209 @@
+import math
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Seconds; covers a ~5 ms adb server request up to a slow Wi-Fi connect.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Registry:
+    """
+    Minimal Prometheus-style metric store (counters, gauges, histograms with labels).
+    snapshot() returns plain picklable data, so a worker process can ship its
+    metrics through a multiprocessing queue and the GUI process can render them.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _declare(self, kind: str, name: str, help_text: str, labels: Tuple[str, ...], buckets=None):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = {"type": kind, "help": help_text, "labels": tuple(labels),
+                                       "buckets": tuple(buckets) if buckets else None, "values": {}}
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self._declare("counter", name, help_text, tuple(labels))
+
+    def gauge(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self._declare("gauge", name, help_text, tuple(labels))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self._declare("histogram", name, help_text, tuple(labels), buckets)
+
+    def _key(self, metric: dict, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in metric["labels"])
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            metric = self._metrics[name]
+            key = self._key(metric, labels)
+            metric["values"][key] = metric["values"].get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            metric = self._metrics[name]
+            metric["values"][self._key(metric, labels)] = value
+
+    def clear(self, name: str):
+        """Drops every series of a metric (e.g. per-session gauges before re-collecting them)."""
+        with self._lock:
+            self._metrics[name]["values"].clear()
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            metric = self._metrics[name]
+            key = self._key(metric, labels)
+            state = metric["values"].get(key)
+            if state is None:
+                state = metric["values"][key] = {"counts": [0] * len(metric["buckets"]), "sum": 0.0, "count": 0}
+            # Counts are stored cumulatively, as the exposition format expects.
+            for i, bound in enumerate(metric["buckets"]):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            snap = {}
+            for name, metric in self._metrics.items():
+                values = {k: (dict(v, counts=list(v["counts"])) if isinstance(v, dict) else v)
+                          for k, v in metric["values"].items()}
+                snap[name] = dict(metric, values=values)
+            return snap
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: tuple, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(*snapshots: Dict[str, dict]) -> str:
+    """
+    Renders one or more snapshots in the Prometheus text exposition format (0.0.4).
+    Series of the same metric from different snapshots are listed together, so
+    they must be told apart by their labels.
+    """
+    merged: Dict[str, dict] = {}
+    for snap in snapshots:
+        for name, metric in (snap or {}).items():
+            if name in merged:
+                merged[name]["values"].update(metric["values"])
+            else:
+                merged[name] = dict(metric, values=dict(metric["values"]))
+
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key in sorted(metric["values"]):
+            value = metric["values"][key]
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(metric['labels'], key)} {_format_value(value)}")
+                continue
+            for bound, count in zip(metric["buckets"], value["counts"]):
+                lines.append(f"{name}_bucket{_format_labels(metric['labels'], key, ('le', _format_value(float(bound))))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(metric['labels'], key, ('le', '+Inf'))} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(metric['labels'], key)} {_format_value(value['sum'])}")
+            lines.append(f"{name}_count{_format_labels(metric['labels'], key)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def adb_latency_hook(registry: Registry, process: str) -> Callable[[dict], None]:
+    """
+    Tracing hook (see tracing.add_hook) feeding adb call durations into the
+    "adb_call_duration_seconds" histogram, labelled by command, backend and process.
+    """
+    registry.histogram("adb_call_duration_seconds", "Duration of adb calls.", ("command", "backend", "process"))
+
+    def hook(record: dict):
+        if record["kind"] == "adb-socket":
+            command, backend = record["name"], "socket"
+        elif record["kind"] == "subprocess" and record["name"].split(" ")[0] in ("adb", "adb.exe"):
+            command, backend = record["name"].partition(" ")[2] or "adb", "binary"
+        else:
+            return
+        registry.observe("adb_call_duration_seconds", record["duration"],
+                         command=command, backend=backend, process=process)
+    return hook
+
+
+def make_wsgi_app(render_metrics: Callable[[], str]):
+    """WSGI app serving render_metrics() on /metrics (any other path is a 404)."""
+    def app(environ, start_response):
+        if environ.get("PATH_INFO", "/") != "/metrics":
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"Not Found\n"]
+        body = render_metrics().encode("utf-8")
+        start_response("200 OK", [("Content-Type", "text/plain; version=0.0.4; charset=utf-8"),
+                                  ("Content-Length", str(len(body)))])
+        return [body]
+    return app
+
+
+class SessionTelemetry:
+    """
+    Session metrics for a ScrcpySessionManager: lifecycle counters are bumped by
+    the caller, per-session gauges and time-to-first-frame are read in collect().
+    """
+
+    def __init__(self, registry: Optional[Registry] = None):
+        self.registry = registry or Registry()
+        r = self.registry
+        r.counter("scrcpy_session_starts_total", "Sessions started on request.", ("serial",))
+        r.counter("scrcpy_session_failures_total", "Sessions that failed to start or exited unexpectedly.", ("serial",))
+        r.counter("scrcpy_session_restarts_total", "Automatic restarts after a crash.", ("serial",))
+        r.gauge("scrcpy_sessions_active", "Sessions currently supervised.")
+        r.gauge("scrcpy_session_up", "1 if the session's scrcpy process is running.", ("serial",))
+        r.counter("scrcpy_session_cpu_seconds_total", "CPU time used by the session's scrcpy process.", ("serial",))
+        r.gauge("scrcpy_session_rss_bytes", "Resident memory of the session's scrcpy process.", ("serial",))
+        r.histogram("scrcpy_time_to_first_frame_seconds", "Time from spawn to the first decoded frame.",
+                    buckets=(0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0))
+        self._observed = set()
+
+    def started(self, key: str):
+        self.registry.inc("scrcpy_session_starts_total", serial=key)
+
+    def failed(self, key: str):
+        self.registry.inc("scrcpy_session_failures_total", serial=key)
+
+    def restarted(self, key: str):
+        self.registry.inc("scrcpy_session_restarts_total", serial=key)
+
+    def collect(self, manager) -> Dict[str, dict]:
+        """Refreshes the per-session gauges from manager.status() and returns a snapshot."""
+        r = self.registry
+        for name in ("scrcpy_session_up", "scrcpy_session_cpu_seconds_total", "scrcpy_session_rss_bytes"):
+            r.clear(name)
+        observed = set()
+        for entry in manager.status():
+            key = entry["key"]
+            r.set("scrcpy_session_up", 1 if entry["running"] else 0, serial=key)
+            if entry["cpu_seconds"] is not None:
+                r.set("scrcpy_session_cpu_seconds_total", entry["cpu_seconds"], serial=key)
+            if entry["rss_bytes"] is not None:
+                r.set("scrcpy_session_rss_bytes", entry["rss_bytes"], serial=key)
+            # One observation per launch (a restart gets a new pid)
+            if entry.get("first_frame") is not None:
+                launch = (key, entry["pid"])
+                if launch not in self._observed:
+                    r.observe("scrcpy_time_to_first_frame_seconds", entry["first_frame"])
+                observed.add(launch)
+        self._observed = observed
+        r.set("scrcpy_sessions_active", len(manager))
+        return r.snapshot()
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import logging
+import asyncio
+import functools
+import threading
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Span handlers. Empty means tracing is disabled and every wrapper below
+# reduces to one list check before calling straight through.
+_hooks: List[Callable[[dict], None]] = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook: Callable[[dict], None]):
+    """
+    Registers a callback that receives every finished span:
+    {"kind": "subprocess" | "adb-socket" | "call", "name", "argv", "start", "end",
+     "duration", "returncode", "output_bytes", "error", "pid", "tid"}
+    start/end are time.perf_counter() seconds. Callbacks run on the thread that
+    made the call, so they should be quick.
+    """
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[dict], None]):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def enabled() -> bool:
+    return bool(_hooks)
+
+
+def _emit(record: dict):
+    for hook in list(_hooks):
+        try:
+            hook(record)
+        except Exception as e:
+            logger.error(f"Trace hook failed: {e}")
+
+
+class _Span:
+    """Times a block and hands the record to the hooks. The caller may fill in returncode/output_bytes."""
+    __slots__ = ("record",)
+
+    def __init__(self, kind: str, name: str, argv: Optional[List[str]]):
+        self.record = {"kind": kind, "name": name, "argv": argv, "returncode": None,
+                       "output_bytes": None, "error": None, "pid": os.getpid(), "tid": threading.get_ident()}
+
+    def __enter__(self) -> dict:
+        self.record["start"] = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        record = self.record
+        record["end"] = time.perf_counter()
+        record["duration"] = record["end"] - record["start"]
+        if exc is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        _emit(record)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> dict:
+        return {}
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(kind: str, name: str, argv: Optional[List[str]] = None):
+    """Context manager recording one span; yields a dict for returncode/output_bytes."""
+    if not _hooks:
+        return _NULL_SPAN
+    return _Span(kind, name, argv)
+
+
+def _output_size(data) -> int:
+    if data is None:
+        return 0
+    return len(data.encode("utf-8", errors="replace")) if isinstance(data, str) else len(data)
+
+
+def command_name(argv: List[str]) -> str:
+    """Short span name for a command line, e.g. "adb devices" or "scrcpy"."""
+    name = os.path.basename(str(argv[0]))
+    # "adb -s SERIAL shell ..." is named after the adb command, not the serial
+    rest = [a for a in argv[1:] if not str(a).startswith("-")]
+    if len(argv) > 2 and argv[1] == "-s":
+        rest = rest[1:]
+    return f"{name} {rest[0]}" if rest else name
+
+
+def run(argv: List[str], **kwargs) -> subprocess.CompletedProcess:
+    """Drop-in replacement for subprocess.run that records a "subprocess" span."""
+    if not _hooks:
+        return subprocess.run(argv, **kwargs)
+    with _Span("subprocess", command_name(argv), [str(a) for a in argv]) as record:
+        result = subprocess.run(argv, **kwargs)
+        record["returncode"] = result.returncode
+        record["output_bytes"] = _output_size(result.stdout) + _output_size(result.stderr)
+        return result
+
+
+def traced(fn: Callable) -> Callable:
+    """Decorator recording a "call" span named after the function's qualified name."""
+    name = fn.__qualname__
+
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if not _hooks:
+                return await fn(*args, **kwargs)
+            with _Span("call", name, None):
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _hooks:
+            return fn(*args, **kwargs)
+        with _Span("call", name, None):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class ChromeTraceRecorder:
+    """
+    Hook collecting spans as Chrome trace events (chrome://tracing, Perfetto).
+
+        recorder = ChromeTraceRecorder()
+        add_hook(recorder)
+        ...
+        recorder.export("trace.json")
+    """
+
+    def __init__(self, max_events: int = 100000):
+        self.max_events = max_events
+        self.events: List[dict] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict):
+        args = {k: record[k] for k in ("argv", "returncode", "output_bytes", "error") if record.get(k) is not None}
+        event = {
+            "name": record["name"], "cat": record["kind"], "ph": "X",
+            "ts": round(record["start"] * 1e6, 1), "dur": round(record["duration"] * 1e6, 1),
+            "pid": record["pid"], "tid": record["tid"], "args": args,
+        }
+        with self._lock:
+            if len(self.events) >= self.max_events:
+                self.dropped += 1
+                return
+            self.events.append(event)
+
+    def to_dict(self) -> Dict[str, list]:
+        with self._lock:
+            return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def export(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+        logger.info(f"Trace written to {path} ({len(self.events)} events, {self.dropped} dropped)")
@@ -0,0 +1,296 @@
+"""
+Session worker for the GUI. It runs in its own process, so this module imports
+only what the worker needs and has no side effects at import: no Eel, gevent or
+bottle, and no GUI folder scan. scrcpy_wrapper3v is imported when the worker starts.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from multiprocessing.connection import wait
+
+# Only used where a scrcpy process (or the command queue) cannot be waited on directly.
+SENTINEL_POLL_INTERVAL = 0.5
+# scrcpy output forwarded per session per second; the rest is counted as dropped.
+OUTPUT_LINES_PER_SECOND = 50
+# Prometheus endpoint on http://127.0.0.1:<port>/metrics; unset or 0 disables telemetry.
+METRICS_PORT = int(os.environ.get('GUIPY_METRICS_PORT') or 0)
+# How often (seconds) the worker ships its session metrics to the GUI process.
+TELEMETRY_INTERVAL = 5
+
+def session_key(s):
+    """Sessions are keyed by the Wi-Fi endpoint or the USB serial they target."""
+    tcp_ip = s.get('tcp_ip', None)
+    serial = s.get('serial', None)
+    if tcp_ip and tcp_ip.strip(): return tcp_ip.strip()
+    if serial and serial != "No devices found": return serial
+    return 'usb'
+
+class OutputThrottle:
+    """Forwards a session's scrcpy output to the log queue, at most `rate` lines per second."""
+
+    def __init__(self, key, log_queue, rate=OUTPUT_LINES_PER_SECOND):
+        self.key = key
+        self.log_queue = log_queue
+        self.rate = rate
+        self.window_start = time.monotonic()
+        self.sent = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._flush_timer = None
+
+    def __call__(self, line):
+        with self._lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self._flush()
+                self.window_start, self.sent = now, 0
+            if self.sent < self.rate:
+                self.sent += 1
+                self.log_queue.put(f"[{self.key}] {line}")
+            else:
+                self.dropped += 1
+                # Report the drops when the window ends, even if no further line arrives
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.window_start + 1.0 - now, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+
+    def flush(self):
+        """Reports the lines dropped so far."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._flush_timer:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self.dropped:
+            self.log_queue.put(f"[{self.key}] ... {self.dropped} lines dropped")
+            self.dropped = 0
+
+def build_client(s, log_queue):
+    """Creates a ScrcpyClient (or a HeadlessRecorder wrapping one) configured from the GUI settings dict."""
+    from scrcpy_wrapper3v import HeadlessRecorder, bitrate_to_bps, get_client
+    client = get_client(s.get('env_path', ''), debug=True)
+    client.on_output = OutputThrottle(session_key(s), log_queue)
+    log_queue.put(f"Worker: Initializing Scrcpy...")
+
+    # 1. Connection
+    tcp_ip = s.get('tcp_ip', None)
+    serial = s.get('serial', None)
+    
+    if tcp_ip and tcp_ip.strip():
+        client.connect_device(device_ip_port=tcp_ip)
+
+    # Measure USB vs Wi-Fi for this device (cached per device) and stream over the faster one
+    probe = None
+    target = tcp_ip.strip() if tcp_ip and tcp_ip.strip() else serial
+    if s.get('auto_transport', False) and target and target != "No devices found":
+        try:
+            probe = client.probe_transports(target)
+        except Exception as e:
+            log_queue.put(f"Worker: Transport probe failed ({e}), using the selected connection.")
+        if probe:
+            log_queue.put(f"Worker: Using {probe['type'].upper()} ({probe['best']}){' [cached probe]' if probe['cached'] else ''}, "
+                          f"video capped at {probe['video']['bitrate']} / {probe['video']['max_size'] or 'native'} / {probe['video']['fps']} fps")
+
+    if probe:
+        client.set_connection(serial=probe['best'])
+    elif tcp_ip and tcp_ip.strip():
+        client.set_connection(tcp=True)
+        # The endpoint is the device's adb serial; restarts check it before relaunching
+        client.serial = tcp_ip.strip()
+    elif serial and serial != "No devices found":
+        client.set_connection(serial=serial)
+    else:
+        client.set_connection(usb=True)
+
+    # 2. Video
+    max_size, fps, bitrate = int(s.get('max_size', 0)), int(s.get('fps', 0)), s.get('bitrate', None)
+    if probe:
+        caps = probe['video']
+        if caps['max_size'] and (not max_size or max_size > caps['max_size']): max_size = caps['max_size']
+        if not fps or fps > caps['fps']: fps = caps['fps']
+        if not bitrate_to_bps(bitrate) or bitrate_to_bps(bitrate) > bitrate_to_bps(caps['bitrate']): bitrate = caps['bitrate']
+
+    client.set_video(
+        max_size=max_size,
+        fps=fps,
+        bitrate=bitrate,
+        codec=s.get('video_codec', 'h265'),
+        buffer=int(s.get('video_buffer', 0)),
+        codec_options=s.get('codec_options', None),
+        no_video=s.get('no_video', False)
+    )
+
+    # 3. Audio
+    audio_src = s.get('audio_source', 'playback')
+    dup = s.get('audio_dup', False)
+    if audio_src == 'mic': dup = False 
+
+    client.set_audio(
+        source=audio_src, codec=s.get('audio_codec', 'aac'),
+        bitrate=s.get('audio_bitrate', None), audio_dup=dup,
+        no_audio=s.get('no_audio', False)
+    )
+
+    # 4. App
+    wx = int(s['window_x']) if s.get('window_x') else None
+    wy = int(s['window_y']) if s.get('window_y') else None
+    ww = int(s['window_width']) if s.get('window_width') else None
+    wh = int(s['window_height']) if s.get('window_height') else None
+
+    client.set_application(
+        title=s.get('window_title', "GUIPy Scrcpy"),
+        fullscreen=s.get('fullscreen', False),
+        always_top=s.get('always_top', False),
+        borderless=s.get('borderless', False),
+        window_x=wx, window_y=wy, width=ww, height=wh
+    )
+
+    # 5. Control & Controller
+    client.set_control(
+        no_control=s.get('no_control', False),
+        stay_awake=s.get('stay_awake', False),
+        turn_screen_off=s.get('turn_screen_off', False),
+        power_off_on_close=s.get('power_off_on_close', False)
+    )
+    client.set_controller(
+        keyboard=s.get('keyboard_mode', 'sdk'),
+        mouse=s.get('mouse_mode', 'sdk'),
+        gamepad=s.get('gamepad_mode', 'disabled')
+    )
+
+    # 6. Camera & Advanced
+    if s.get('use_camera', False):
+        cid = int(s['camera_id']) if s.get('camera_id') else None
+        client.set_camera(video_source="camera", camera_facing=s.get('camera_facing', None),
+                          camera_size=s.get('camera_size', None), camera_id=cid)
+
+    client.set_advanced(
+        crop=s.get('crop', None),
+        record_file=s.get('record_filename', None),
+        record_format=s.get('record_format', 'mp4'),
+        disable_screensaver=True
+    )
+
+    # 7. Headless recording (no window, no control, rotating segments)
+    if s.get('headless_record', False):
+        minutes = float(s['segment_minutes']) if s.get('segment_minutes') else None
+        quota_gb = float(s['record_quota_gb']) if s.get('record_quota_gb') else None
+        client = HeadlessRecorder(
+            client, directory=s.get('record_dir') or 'recordings',
+            record_format=s.get('record_format', 'mkv'),
+            segment_seconds=minutes * 60 if minutes else None,
+            quota_bytes=int(quota_gb * 1024 ** 3) if quota_gb else None,
+            prefix=re.sub(r'[^\w.-]', '_', session_key(s))
+        )
+
+    # 8. Metrics
+    if s.get('print_fps', False) and not s.get('headless_record', False):
+        key = session_key(s)
+        client.set_metrics()
+        client.on_metrics = lambda summary: log_queue.put({'type': 'metrics', 'key': key, 'metrics': summary})
+
+    return client
+
+def handle_command(msg, manager, log_queue, stats=None):
+    """Executes one worker command. Returns False when the worker must exit."""
+    if msg['action'] == 'START':
+        s = msg['data']
+        key = session_key(s)
+        
+        try:
+            from scrcpy_wrapper3v import RestartPolicy
+            client = build_client(s, log_queue)
+            policy = RestartPolicy() if s.get('auto_restart', False) else None
+            manager.start(key, client, restart_policy=policy)
+            if stats: stats.started(key)
+            log_queue.put(f"Worker: Streaming Started! [{key}] ({len(manager)} active)")
+
+        except Exception as e:
+            if stats: stats.failed(key)
+            log_queue.put(f"Worker Error [{key}]: {str(e)}")
+
+    elif msg['action'] == 'STOP':
+        key = msg.get('serial')
+        if key:
+            if manager.stop(key):
+                log_queue.put(f"Worker: Streaming Stopped [{key}].")
+        elif manager.stop_all():
+            log_queue.put("Worker: Streaming Stopped.")
+
+    elif msg['action'] == 'STATUS':
+        log_queue.put({'type': 'sessions', 'sessions': manager.status(msg.get('serial'))})
+    
+    elif msg['action'] == 'KILL':
+        manager.stop_all()
+        return False
+
+    return True
+
+def scrcpy_worker_process(command_queue, log_queue):
+    from scrcpy_wrapper3v import ScrcpySessionManager, process_usage
+    manager = ScrcpySessionManager(max_sessions=int(os.environ.get('GUIPY_MAX_SESSIONS', 16)))
+    logger = logging.getLogger("Worker")
+    logger.setLevel(logging.INFO)
+    # The queue's pipe end becomes readable as soon as a command is sent, so the
+    # worker can sleep on it together with the scrcpy process sentinels. It is a
+    # private attribute of multiprocessing.Queue: without it, commands are polled.
+    command_reader = getattr(command_queue, '_reader', None)
+    waitables = [command_reader] if command_reader is not None else []
+
+    stats, next_telemetry = None, None
+    if METRICS_PORT:
+        import telemetry, tracing
+        stats = telemetry.SessionTelemetry()
+        tracing.add_hook(telemetry.adb_latency_hook(stats.registry, 'worker'))
+        next_telemetry = time.monotonic()
+
+    usage = process_usage(os.getpid()) or {}
+    log_queue.put({'type': 'ready', 'pid': os.getpid(), 'ready_at': time.time(), 'rss_bytes': usage.get('rss_bytes')})
+    
+    while True:
+        try:
+            timeout = SENTINEL_POLL_INTERVAL if command_reader is None or manager.needs_polling() else None
+            restart_in = manager.next_restart_in()
+            if restart_in is not None:
+                timeout = restart_in if timeout is None else min(timeout, restart_in)
+            if next_telemetry is not None:
+                telemetry_in = max(0.0, next_telemetry - time.monotonic())
+                timeout = telemetry_in if timeout is None else min(timeout, telemetry_in)
+            ready = wait(waitables + manager.sentinels(), timeout)
+
+            if command_reader is None or command_reader in ready:
+                keep_running = True
+                while keep_running and not command_queue.empty():
+                    keep_running = handle_command(command_queue.get(), manager, log_queue, stats)
+                if not keep_running: break
+            
+            for ev in manager.reap():
+                if ev['returncode'] == 0:
+                    log_queue.put(f"Worker: Session ended [{ev['key']}].")
+                    continue
+                if stats: stats.failed(ev['key'])
+                msg = f"Worker Alert: Process ended unexpectedly [{ev['key']}] (exit code {ev['returncode']})."
+                if ev['state'] == 'restarting': msg += f" Restarting in {ev['retry_in']}s."
+                elif ev['state'] == 'failed': msg += " Crash loop detected, giving up."
+                log_queue.put(msg)
+
+            for ev in manager.restart_due():
+                if stats and ev['state'] == 'running': stats.restarted(ev['key'])
+                if ev['state'] == 'running':
+                    log_queue.put(f"Worker: Session restarted [{ev['key']}] (restart #{ev['restarts']}, down {ev['downtime']}s).")
+                elif ev['state'] == 'waiting_device':
+                    log_queue.put(f"Worker: Waiting for device [{ev['key']}] to come back before restarting...")
+                elif ev['state'] == 'failed':
+                    log_queue.put(f"Worker Alert: Restart failed repeatedly [{ev['key']}], giving up.")
+
+            if next_telemetry is not None and time.monotonic() >= next_telemetry:
+                log_queue.put({'type': 'telemetry', 'metrics': stats.collect(manager)})
+                next_telemetry = time.monotonic() + TELEMETRY_INTERVAL
+
+        except Exception as e:
+            log_queue.put(f"Critical Worker Error: {e}")